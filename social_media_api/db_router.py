@@ -0,0 +1,112 @@
+"""Read replicas with read-your-writes stickiness.
+
+``PrimaryReplicaRouter`` sends every write to ``default`` and the reads of
+a GET or HEAD request to a random alias of DATABASE_REPLICAS, once the
+request's user is known. Everything else reads from the primary: requests
+with other methods, reads made before authentication (so logins and token
+checks never see a lagging replica), reads after the request has written,
+and all code that runs outside a request, such as management commands and
+jobs.
+
+``PrimaryPinningMiddleware`` tracks the routing state of each request.
+When a request writes, its user is pinned to the primary for
+DATABASE_PIN_SECONDS, so that user's next reads include their own writes
+even if the replicas lag behind. The pins live in the cache and need a
+shared backend when the API runs in several processes.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_routing = contextvars.ContextVar("database_routing", default=None)
+
+
+def pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def _user_id(request):
+    # DRF stores the user it authenticated on the HttpRequest; until then it
+    # is the lazy session user, which would cost a query to look at
+    user = vars(request).get("user")
+    if user is None or isinstance(user, SimpleLazyObject):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class RequestRouting:
+    __slots__ = ("request", "wrote", "pinned")
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        # Looked up once the user is known
+        self.pinned = None
+
+    def use_replica(self):
+        if self.wrote or self.request.method not in SAFE_METHODS:
+            return False
+        if self.pinned is None:
+            user_id = _user_id(self.request)
+            if user_id is None:
+                return False
+            self.pinned = bool(cache.get(pin_key(user_id)))
+        return not self.pinned
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            not settings.DATABASE_REPLICAS
+            or routing is None
+            or not routing.use_replica()
+        ):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get the schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryPinningMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        user_id = _user_id(request)
+        if routing.wrote and user_id is not None:
+            cache.set(pin_key(user_id), True, timeout=settings.DATABASE_PIN_SECONDS)
+        return response
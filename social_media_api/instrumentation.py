@@ -0,0 +1,157 @@
+"""Lightweight per-request performance instrumentation.
+
+``PerformanceMiddleware`` collects the SQL query count, database time,
+authentication time, serialization time and total time of every request,
+reports them in a ``Server-Timing`` header and in one log line per request
+on the ``social_media_api.performance`` logger. Collecting costs a context
+variable lookup per query and per span, so it can stay on in production.
+"""
+import contextvars
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import ListSerializer
+
+logger = logging.getLogger("social_media_api.performance")
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+SERVER_TIMING_SPANS = ("db", "auth", "serialize")
+
+
+class RequestMetrics:
+    __slots__ = ("started", "queries", "durations")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = defaultdict(float)
+
+    def as_dict(self):
+        """Returns the collected numbers, durations in milliseconds"""
+        metrics = {"queries": self.queries}
+        for name in SERVER_TIMING_SPANS:
+            metrics[f"{name}_ms"] = round(self.durations[name] * 1000, 2)
+        metrics["total_ms"] = round(self.durations["total"] * 1000, 2)
+        return metrics
+
+
+def current_metrics():
+    """Returns the metrics of the request being handled, if it is instrumented"""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Adds the time spent in the block to the named duration of the request"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.durations["db"] += time.perf_counter() - started
+
+
+@contextmanager
+def record_queries():
+    """Counts the queries of this thread's connections towards the current request"""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_record_query))
+        yield
+
+
+class TimedAuthenticationMixin:
+    """Reports the time DRF spends authenticating the request as 'auth'"""
+
+    def perform_authentication(self, request):
+        with span("auth"):
+            super().perform_authentication(request)
+
+
+class TimedListSerializer(ListSerializer):
+    @property
+    def data(self):
+        with span("serialize"):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Reports the time spent building ``serializer.data`` as 'serialize'"""
+
+    @property
+    def data(self):
+        with span("serialize"):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with record_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.durations["total"] = time.perf_counter() - metrics.started
+
+        values = metrics.as_dict()
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'db;dur={values["db_ms"]};desc="{metrics.queries} queries"',
+                    f'auth;dur={values["auth_ms"]}',
+                    f'serialize;dur={values["serialize_ms"]}',
+                    f'total;dur={values["total_ms"]}',
+                ]
+            )
+
+        match = request.resolver_match
+        values = {
+            "view": match.view_name if match else None,
+            "method": request.method,
+            "status": response.status_code,
+            **values,
+        }
+        slow = values["total_ms"] >= settings.PERFORMANCE_SLOW_REQUEST_MS
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            " ".join(f"{key}={value}" for key, value in values.items()),
+            extra={"metrics": values},
+        )
+        return response
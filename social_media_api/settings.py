@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "social_media_api.instrumentation.PerformanceMiddleware",
+    "social_media_api.db_router.PrimaryPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -92,6 +94,23 @@ DATABASES = {
     }
 }
 
+# Read replicas, see social_media_api/db_router.py. DATABASE_REPLICAS=<n> in
+# the environment adds n SQLite files standing in for replicas; copy the
+# primary into them with ``manage.py sync_replicas``.
+DATABASE_REPLICAS = []
+for index in range(1, int(os.environ.get("DATABASE_REPLICAS", 0)) + 1):
+    DATABASES[f"replica{index}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.replica{index}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["social_media_api.db_router.PrimaryReplicaRouter"]
+
+# How long a user's reads stay on the primary after they wrote
+DATABASE_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -141,13 +160,23 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "social_media_api.throttling.AnonRateThrottle",
+        "social_media_api.throttling.UserRateThrottle",
+        "social_media_api.throttling.ScopedRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "1000/day", "user": "1000/day"},
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "1000/day",
+        "user": "1000/day",
+        # Scopes of the write actions and the uploads, see throttle_scope in
+        # social_media_service/views.py
+        "like": "300/hour",
+        "comment": "60/hour",
+        "follow": "100/hour",
+        "uploads": "5000/day",
+    },
+    "DEFAULT_AUTHENTICATION_CLASSES": ("user.authentication.CachedJWTAuthentication",),
+    "DEFAULT_PAGINATION_CLASS": "social_media_service.pagination.KeysetPagination",
+    "PAGE_SIZE": 20,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -166,8 +195,116 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Per-request query count and timings, see social_media_api/instrumentation.py
+PERFORMANCE_INSTRUMENTATION = True
+PERFORMANCE_SERVER_TIMING = True
+# Requests slower than this are logged at WARNING, all others at INFO;
+# set PERFORMANCE_LOG_LEVEL=INFO in the environment to log every request
+PERFORMANCE_SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "social_media_api.performance": {
+            "handlers": ["console"],
+            "level": os.environ.get("PERFORMANCE_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Home timeline: posts are fanned out to followers on write, except for
+# authors with at least TIMELINE_FANOUT_MAX_FOLLOWERS followers whose posts
+# are pulled into their followers' timelines at read time.
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10_000
+TIMELINE_FANOUT_BATCH_SIZE = 1_000
+TIMELINE_BACKFILL_LIMIT = 200
+
+# Time-decayed trending scores of posts, see social_media_service/trending.py;
+# an event counts half as much every TRENDING_HALF_LIFE seconds
+TRENDING_HALF_LIFE = 12 * 60 * 60
+TRENDING_WEIGHTS = {"post": 1.0, "like": 1.0, "comment": 3.0}
+
+# Replies listed under each top-level comment of a post, see
+# social_media_service/threads.py
+COMMENT_REPLIES_PREVIEW = 3
+
+# Follow suggestions kept per profile, see social_media_service/suggestions.py
+SUGGESTIONS_PER_PROFILE = 50
+
+# Per-process index of the follow graph, see social_media_service/graph_index.py;
+# loaded from the FOLLOW_GRAPH_SNAPSHOT file written by
+# ``manage.py snapshot_follow_graph`` while it is recent enough, in a
+# background thread unless FOLLOW_GRAPH_LOAD_IN_BACKGROUND is off
+FOLLOW_GRAPH_INDEX = True
+FOLLOW_GRAPH_LOAD_IN_BACKGROUND = True
+FOLLOW_GRAPH_SNAPSHOT = os.environ.get("FOLLOW_GRAPH_SNAPSHOT") or None
+FOLLOW_GRAPH_MAX_AGE = 5 * 60
+FOLLOW_GRAPH_MAX_DELTA = 10_000
+
+# Maximum number of ids accepted by the bulk like/follow endpoints
+BULK_ACTION_MAX_IDS = 500
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60 * 60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.serializers.TokenVerifySerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "user.serializers.TokenBlacklistSerializer",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "social-media-api",
+        # Least recently used keys are culled once the cache is full
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
+    },
 }
+
+# Cache alias holding the throttle counters, see social_media_api/throttling.py
+THROTTLE_CACHE = "default"
+
+# Read-through cache of Profile and Post rows, see
+# social_media_service/object_cache.py; bump the version when a serializer
+# changes shape to orphan every cached representation
+OBJECT_CACHE_TIMEOUT = 300
+OBJECT_CACHE_VERSION = 1
+
+# Users resolved by user.authentication.CachedJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_USER_CACHE_VERSION = 1
+
+# Bloom filter index of blacklisted refresh tokens, see user/blacklist.py
+TOKEN_BLACKLIST_BLOOM_CAPACITY = 1_000_000
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = 0.001
+TOKEN_BLACKLIST_SYNC_INTERVAL = 5
+TOKEN_BLACKLIST_SYNC_OVERLAP = 1_000
+
+# Longest side in pixels of the renditions made of uploaded images, see
+# social_media_service/renditions.py
+IMAGE_RENDITION_SIZES = {"thumbnail": 160, "feed": 720, "full": 1600}
+IMAGE_RENDITION_QUALITY = 80
+# Processes the run_jobs worker renders in; with 0 it renders in its threads
+IMAGE_RENDITION_WORKERS = 2
+
+# Chunked uploads, see social_media_service/uploads.py
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+UPLOAD_COPY_BUFFER_SIZE = 64 * 1024
+
+# Database job queue, see social_media_service/jobs.py
+JOB_WORKER_CONCURRENCY = 4
+JOB_POLL_INTERVAL = 1.0
+JOB_RETRY_DELAY = 30
+JOB_LOCK_TIMEOUT = 15 * 60
+
+# Run the ORM calls of the async read views (social_media_service/async_views.py)
+# on pool threads with their own connections, so that the independent queries
+# of a request overlap. Needs a database that takes concurrent connections.
+ASYNC_CONCURRENT_QUERIES = True
@@ -0,0 +1,90 @@
+"""Rate limits counted in sliding windows at a constant cost per request.
+
+DRF's throttles keep the timestamp of every request of the last period in
+one cache value, which they read, trim and write back whole on each
+request: the cost grows with the rate, and two processes handling the same
+client at once each write back their own list, so one request is lost.
+
+These throttles count requests in fixed windows as long as the rate's
+period instead, one cache key per window, with an atomic ``incr``. The
+requests made in the sliding period that ends now are estimated from the
+current window's count plus the previous window's, weighted by how much of
+the previous window that period still overlaps. A request costs an add, an
+increment and a read however high the rate is, and a refused request takes
+its increment back. The counters live in the THROTTLE_CACHE alias, which
+needs a backend shared by every process with an atomic increment, such as
+Redis or Memcached, when the API runs in several processes.
+
+``ScopedRateThrottle`` limits the views that set ``throttle_scope``, and
+the actions declared with ``@action(throttle_scope=...)``, to the rate of
+that scope in DEFAULT_THROTTLE_RATES.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import throttling
+
+
+class SlidingWindowRateThrottle(throttling.SimpleRateThrottle):
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        self.elapsed = offset / self.duration
+        key = f"{self.key}:{int(window)}"
+
+        # A counter outlives its window by one period, to weigh the next one
+        self.cache.add(key, 0, timeout=2 * self.duration)
+        try:
+            self.current = self.cache.incr(key)
+        except ValueError:
+            # Culled between the add and the increment
+            self.cache.set(key, 1, timeout=2 * self.duration)
+            self.current = 1
+        self.previous = self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+
+        if self.previous * (1 - self.elapsed) + self.current > self.num_requests:
+            try:
+                self.cache.decr(key)
+            except ValueError:
+                pass
+            self.current -= 1
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Returns the seconds until the estimate leaves room for a request"""
+        if not self.num_requests:
+            return None
+        room = self.num_requests - 1 - self.current
+        if room >= 0:
+            # Room opens as the previous window slides out of the period
+            overlap = 1 - room / self.previous
+            return max(overlap - self.elapsed, 0) * self.duration
+        # The current window alone is full, and has to slide out in turn
+        overlap = 1 - (self.num_requests - 1) / self.current
+        return (1 - self.elapsed + overlap) * self.duration
+
+
+class AnonRateThrottle(throttling.AnonRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class UserRateThrottle(throttling.UserRateThrottle, SlidingWindowRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle, SlidingWindowRateThrottle):
+    pass
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SocialMediaServiceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "social_media_service"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_search_indexes
+
+        post_migrate.connect(install_search_indexes, sender=self)
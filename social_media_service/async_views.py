@@ -0,0 +1,243 @@
+"""Coroutine versions of the hot read endpoints, for deployments behind asgi.py.
+
+Django 4.0 has no async ORM and DRF no async views, so ``AsyncReadView``
+runs DRF's authentication, permission and throttle checks as usual and
+hands every piece of ORM work to ``run_query``. With
+ASYNC_CONCURRENT_QUERIES each call runs on its own thread and database
+connection, so the independent queries of a request (the object and the
+page of its related rows) are awaited together instead of one after the
+other, and the event loop keeps serving other requests meanwhile. Without
+it every call runs on the request's thread, one at a time.
+
+The responses are the same as those of the matching viewset routes.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from social_media_api.instrumentation import TimedAuthenticationMixin, record_queries
+from . import conditional, object_cache, search, threads, timeline
+from .fast_serializers import (
+    FastFollowerListSerializer,
+    FastFollowingListSerializer,
+    FastLikeListSerializer,
+    FastPostListSerializer,
+)
+from .models import Follow, Like, Post, Profile
+from .pagination import KeysetPagination, TimelinePagination
+from .permissions import IsOwnerOrReadOnly
+from .serializers import CommentThreadSerializer, PostSerializer
+
+
+def _on_own_connection(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            with record_queries():
+                return func(*args, **kwargs)
+        finally:
+            # Pool threads see no request_finished, so honour CONN_MAX_AGE here
+            close_old_connections()
+
+    return wrapper
+
+
+def run_query(func, *args, **kwargs):
+    """Awaits a call that uses the ORM without blocking the event loop"""
+    if settings.ASYNC_CONCURRENT_QUERIES:
+        return sync_to_async(_on_own_connection(func), thread_sensitive=False)(
+            *args, **kwargs
+        )
+    return sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+
+async def run_queries(*calls):
+    """Awaits ``(func, *args)`` calls together and returns their results.
+
+    Every call is awaited to the end even if another fails, so that none is
+    left running after the response has been sent; the first error is then
+    raised.
+    """
+    if not settings.ASYNC_CONCURRENT_QUERIES:
+        # They would take turns on the request's thread anyway
+        return [await run_query(*call) for call in calls]
+
+    results = await asyncio.gather(
+        *(run_query(*call) for call in calls), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+
+class AsyncReadView(TimedAuthenticationMixin, APIView):
+    """APIView whose ``get`` is a coroutine"""
+
+    permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    # The documented routes are the viewset ones these views mirror
+    schema = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return markcoroutinefunction(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_query(self.initial, request, *args, **kwargs)
+            if request.method.lower() in ("get", "head"):
+                response = await self.get(request, *args, **kwargs)
+            else:
+                response = self.http_method_not_allowed(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def get_serializer_context(self):
+        return {"request": self.request, "format": self.format_kwarg, "view": self}
+
+    def get_object(self, queryset, pk):
+        instance = object_cache.get_object(queryset, pk)
+        if instance is None:
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def page_data(self, queryset, serialize):
+        """Fetches the requested page of the queryset and serializes it"""
+        self.paginator = self.pagination_class()
+        rows = self.paginator.paginate_queryset(queryset, self.request, view=self)
+        return serialize(rows)
+
+
+class PostListView(AsyncReadView):
+    def search_page(self, title):
+        queryset = Post.objects.select_related("author")
+        if title:
+            queryset = search.search(queryset, title)
+
+        return self.page_data(
+            queryset,
+            lambda posts: PostSerializer(
+                posts, many=True, context=self.get_serializer_context()
+            ).data,
+        )
+
+    async def get(self, request):
+        data = await run_query(self.search_page, request.query_params.get("title"))
+        return self.paginator.get_paginated_response(data)
+
+
+class PostDetailView(AsyncReadView):
+    permission_classes = (IsAuthenticated, IsOwnerOrReadOnly)
+
+    async def get(self, request, pk):
+        post = await run_query(
+            self.get_object, Post.objects.select_related("author"), pk
+        )
+        etag = conditional.make_etag("post", post.pk, post.version)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        serializer = PostSerializer(post, context=self.get_serializer_context())
+        response = Response(await run_query(object_cache.get_data, serializer))
+        response["ETag"] = etag
+        return response
+
+
+class PostCommentsView(AsyncReadView):
+    async def get(self, request, pk):
+        # The page is only read once the post version shows it is needed
+        post = await run_query(
+            self.get_object, Post.objects.select_related("author"), pk
+        )
+        etag = conditional.make_etag("comments", post.pk, post.version)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        data = await run_query(
+            self.page_data,
+            post.comments.filter(parent__isnull=True).select_related("profile"),
+            lambda comments: CommentThreadSerializer(
+                threads.attach_replies(post, comments), many=True
+            ).data,
+        )
+        response = self.paginator.get_paginated_response(data)
+        response["ETag"] = etag
+        return response
+
+
+class ProfileRowsView(AsyncReadView):
+    """Lists rows related to a profile, read together with the profile itself.
+
+    Subclasses set the ``queryset`` of the rows and the ``profile_field``
+    that holds the id of the profile they belong to.
+    """
+
+    serializer_class = None
+    queryset = None
+    profile_field = None
+
+    def get_rows(self, profile_id):
+        assert self.queryset is not None, (
+            f"'{self.__class__.__name__}' should include a `queryset` attribute, "
+            "or override the `get_rows()` method."
+        )
+        queryset = self.queryset.filter(**{self.profile_field: profile_id})
+        return self.serializer_class.rows_for(queryset)
+
+    async def get(self, request, pk):
+        serializer_class = self.serializer_class
+        _, data = await run_queries(
+            (self.get_object, Profile.objects.select_related("user"), pk),
+            (
+                self.page_data,
+                self.get_rows(pk),
+                lambda rows: serializer_class(rows).data,
+            ),
+        )
+        return self.paginator.get_paginated_response(data)
+
+
+class FollowersView(ProfileRowsView):
+    serializer_class = FastFollowerListSerializer
+    queryset = Follow.objects.all()
+    profile_field = "following_id"
+
+
+class FollowingView(ProfileRowsView):
+    serializer_class = FastFollowingListSerializer
+    queryset = Follow.objects.all()
+    profile_field = "follower_id"
+
+
+class FollowingPostsView(ProfileRowsView):
+    serializer_class = FastPostListSerializer
+    pagination_class = TimelinePagination
+
+    def get_rows(self, profile_id):
+        return timeline.get_timeline(profile_id)
+
+
+class LikedPostsView(ProfileRowsView):
+    serializer_class = FastLikeListSerializer
+    queryset = Like.objects.all()
+    profile_field = "profile_id"
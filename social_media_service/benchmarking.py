@@ -0,0 +1,31 @@
+import math
+import statistics
+import time
+
+
+def percentile(samples, fraction):
+    """Returns the nearest-rank percentile of the samples (fraction in 0..1)"""
+    ordered = sorted(samples)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    """Returns latency statistics in milliseconds for samples given in seconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def measure(func, iterations):
+    """Calls func the given number of times and returns the durations in seconds"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
@@ -0,0 +1,84 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from . import object_cache
+from .models import Comment, Follow, Like, Post, Profile
+
+
+def _increments(deltas, updates):
+    increments = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    increments.update(updates or {})
+    increments["version"] = F("version") + 1
+    return increments
+
+
+def adjust(model, pk, updates=None, **deltas):
+    """Atomically adds the deltas to the counter columns of a single row.
+
+    ``updates`` maps other columns to expressions set by the same UPDATE,
+    such as the trending score of a post.
+    """
+    model.objects.filter(pk=pk).update(**_increments(deltas, updates))
+    object_cache.invalidate(model, pk)
+
+
+def adjust_many(model, pks, updates=None, **deltas):
+    """Atomically adds the same deltas to the counter columns of several rows"""
+    if pks:
+        model.objects.filter(pk__in=pks).update(**_increments(deltas, updates))
+        object_cache.invalidate(model, *pks)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def reconcile_posts(queryset, updates=None):
+    """Recomputes the like and comment counters of the posts with one UPDATE.
+
+    ``updates`` maps other columns to expressions set by the same UPDATE,
+    as for ``adjust()``.
+    """
+    return queryset.update(
+        likes_count=_count(Like.objects.all(), "post"),
+        comments_count=_count(Comment.objects.all(), "post"),
+        version=F("version") + 1,
+        **(updates or {}),
+    )
+
+
+def reconcile_comments(queryset):
+    """Recomputes the reply counters of the comments with one UPDATE"""
+    return queryset.update(
+        replies_count=_count(Comment.objects.all(), "parent"),
+        version=F("version") + 1,
+    )
+
+
+def reconcile_profiles(queryset):
+    """Recomputes the follow and post counters of the profiles with one UPDATE"""
+    return queryset.update(
+        followers_count=_count(Follow.objects.all(), "following"),
+        following_count=_count(Follow.objects.all(), "follower"),
+        posts_count=_count(Post.objects.all(), "author"),
+        version=F("version") + 1,
+    )
+
+
+RECONCILERS = (
+    (Post, reconcile_posts),
+    (Comment, reconcile_comments),
+    (Profile, reconcile_profiles),
+)
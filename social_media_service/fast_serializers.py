@@ -0,0 +1,55 @@
+"""Read-only serializers that build responses from ``values_list()`` rows.
+
+They produce the same output as their ``ModelSerializer`` counterparts in
+``serializers.py`` without instantiating models or running DRF field
+machinery per row. Field lookups are compiled once per class, rows are
+fetched as named tuples (so the keyset paginator can read the ordering
+columns from them) and turned into dicts with a single ``zip``.
+"""
+from social_media_api.instrumentation import span
+
+# Columns every row carries for the keyset paginator
+ORDERING_COLUMNS = ("id", "created_at")
+
+
+class ValuesSerializer:
+    # Maps each output key to the ORM lookup of a text column
+    fields = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._names = tuple(cls.fields)
+        cls._lookups = tuple(cls.fields.values())
+        cls._extra = tuple(
+            column for column in ORDERING_COLUMNS if column not in cls._lookups
+        )
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def rows_for(cls, queryset):
+        """Returns the queryset as named tuples holding just the needed columns"""
+        return queryset.values_list(*cls._lookups, *cls._extra, named=True)
+
+    @property
+    def data(self):
+        with span("serialize"):
+            names = self._names
+            return [dict(zip(names, row)) for row in self.rows]
+
+
+class FastPostListSerializer(ValuesSerializer):
+    fields = {"title": "title", "author": "author__username"}
+
+
+class FastLikeListSerializer(ValuesSerializer):
+    fields = {"profile": "profile__username", "post": "post__title"}
+
+
+class FastFollowerListSerializer(ValuesSerializer):
+    fields = {"follower": "follower__username"}
+
+
+class FastFollowingListSerializer(ValuesSerializer):
+    fields = {"following": "following__username"}
@@ -0,0 +1,330 @@
+"""An in-memory index of the follow graph for membership and overlap checks.
+
+``FollowGraph`` holds the graph as two CSR adjacency arrays over the sorted
+profile ids, one per direction: the profiles followed from position ``i``
+are ``out_indices[out_indptr[i]:out_indptr[i + 1]]``, sorted, and its
+followers the same slice of ``in_indices``. "Does A follow B" is a binary
+search in A's row; mutual followers and followed-by-friends are
+intersections of two sorted rows, without touching the database.
+
+Each process loads its own index on first use, from the snapshot at
+FOLLOW_GRAPH_SNAPSHOT when it is recent enough (``manage.py
+snapshot_follow_graph`` writes it, and it is memory-mapped, so the workers
+of a host share its pages) and otherwise from the database. Follows and
+unfollows made by the process are applied to it as deltas through the
+``follows_created``/``follows_deleted`` signals. Writes of other processes,
+and follows removed with their profiles, show up once the index is
+reloaded: after FOLLOW_GRAPH_MAX_AGE seconds, or sooner once the deltas
+outgrow FOLLOW_GRAPH_MAX_DELTA. A reload only takes a snapshot newer than
+the index it replaces, and the deltas recorded since the new index was
+read from the database are applied to it again, so the process keeps
+seeing its own writes.
+
+Loads run in a background thread (unless FOLLOW_GRAPH_LOAD_IN_BACKGROUND is
+off), so no request waits for one: the old index keeps answering until the
+new one replaces it, and until the first one is ready the questions are
+answered with queries, as they are with FOLLOW_GRAPH_INDEX off.
+"""
+import logging
+import os
+import threading
+import time
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from .models import Follow, Profile
+
+logger = logging.getLogger(__name__)
+
+# Held to swap the index and to record deltas, so none is lost in between
+_load_lock = threading.Lock()
+_graph = None
+# The thread loading the next index, if one is
+_loader = None
+
+
+class FollowGraph:
+    def __init__(self, data, loaded_at):
+        count, edges = (int(value) for value in data[:2])
+        bounds = np.cumsum([2, count, count + 1, edges, count + 1, edges])
+        self.ids, self.out_indptr, self.out_indices, self.in_indptr, self.in_indices = (
+            data[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])
+        )
+        self.data = data
+        self.loaded_at = loaded_at
+        # {profile id: {other profile id: True if followed, False if unfollowed}}
+        self.out_delta, self.in_delta = {}, {}
+        self.delta_size = 0
+        # [(time, follower id, following ids, followed)], in the order applied
+        self.changes = []
+        # How many changes of the index this one replaces were replayed on it
+        self.replayed = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_database(cls):
+        loaded_at = time.time()
+        ids = np.fromiter(
+            Profile.objects.order_by("pk").values_list("pk", flat=True).iterator(),
+            dtype=np.int64,
+        )
+        pairs = np.fromiter(
+            chain.from_iterable(
+                Follow.objects.values_list("follower_id", "following_id").iterator()
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        # Follows of profiles created while loading are left to the next load
+        pairs = pairs[np.isin(pairs, ids).all(axis=1)]
+        followers = np.searchsorted(ids, pairs[:, 0])
+        followings = np.searchsorted(ids, pairs[:, 1])
+
+        out_indptr, out_indices = _csr(followers, followings, len(ids))
+        in_indptr, in_indices = _csr(followings, followers, len(ids))
+        data = np.concatenate(
+            [
+                [len(ids), len(pairs)],
+                ids,
+                out_indptr,
+                out_indices,
+                in_indptr,
+                in_indices,
+            ]
+        ).astype(np.int64)
+        return cls(data, loaded_at)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        return cls(np.load(path, mmap_mode="r"), os.path.getmtime(path))
+
+    def save(self, path):
+        """Writes the base arrays to ``path`` atomically, without the deltas.
+
+        The file is dated when the arrays were read from the database, which
+        is what ``from_snapshot`` takes as the time of the index.
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, self.data)
+        os.utime(temporary, (self.loaded_at, self.loaded_at))
+        os.replace(temporary, path)
+
+    def expired(self):
+        return (
+            time.time() - self.loaded_at > settings.FOLLOW_GRAPH_MAX_AGE
+            or self.delta_size > settings.FOLLOW_GRAPH_MAX_DELTA
+        )
+
+    def _row(self, indptr, indices, pk):
+        position = np.searchsorted(self.ids, pk)
+        if position == len(self.ids) or self.ids[position] != pk:
+            return self.ids[:0]
+        start, stop = indptr[position], indptr[position + 1]
+        return indices[start:stop]
+
+    def _merged(self, indptr, indices, delta, pk):
+        row = self.ids[self._row(indptr, indices, pk)]
+        with self.lock:
+            changes = list(delta.get(pk, {}).items())
+        if not changes:
+            return row
+        added = [other for other, followed in changes if followed]
+        removed = [other for other, followed in changes if not followed]
+        return np.union1d(np.setdiff1d(row, removed, assume_unique=True), added)
+
+    def following(self, pk):
+        """Returns the sorted ids of the profiles the profile follows"""
+        return self._merged(self.out_indptr, self.out_indices, self.out_delta, pk)
+
+    def followers(self, pk):
+        """Returns the sorted ids of the profiles following the profile"""
+        return self._merged(self.in_indptr, self.in_indices, self.in_delta, pk)
+
+    def follows(self, follower_id, following_id):
+        with self.lock:
+            changed = self.out_delta.get(follower_id, {}).get(following_id)
+        if changed is not None:
+            return changed
+        row = self._row(self.out_indptr, self.out_indices, follower_id)
+        position = np.searchsorted(self.ids, following_id)
+        if position == len(self.ids) or self.ids[position] != following_id:
+            return False
+        found = np.searchsorted(row, position)
+        return bool(found < len(row) and row[found] == position)
+
+    def apply(self, follower_id, following_ids, followed, at=None):
+        """Records follows made (``followed``) or removed since the index was loaded"""
+        following_ids = list(following_ids)
+        with self.lock:
+            self.changes.append(
+                (
+                    time.time() if at is None else at,
+                    follower_id,
+                    following_ids,
+                    followed,
+                )
+            )
+            for following_id in following_ids:
+                self.out_delta.setdefault(follower_id, {})[following_id] = followed
+                self.in_delta.setdefault(following_id, {})[follower_id] = followed
+                self.delta_size += 1
+
+    def replay(self, graph):
+        """Applies to ``graph`` the changes recorded after it was loaded.
+
+        Changes replayed on ``graph`` before are skipped, so it can be
+        called again for those recorded since.
+        """
+        with self.lock:
+            seen, graph.replayed = graph.replayed, len(self.changes)
+            changes = self.changes[seen:]
+        for at, follower_id, following_ids, followed in changes:
+            if at >= graph.loaded_at:
+                graph.apply(follower_id, following_ids, followed, at=at)
+        return graph
+
+
+def _csr(rows, columns, count):
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+    return indptr, columns[order]
+
+
+def load(current=None):
+    """Returns a fresh index, with the changes ``current`` recorded since applied"""
+    path = settings.FOLLOW_GRAPH_SNAPSHOT
+    if (
+        path
+        and os.path.exists(path)
+        and time.time() - os.path.getmtime(path) < settings.FOLLOW_GRAPH_MAX_AGE
+        and (current is None or os.path.getmtime(path) > current.loaded_at)
+    ):
+        graph = FollowGraph.from_snapshot(path)
+    else:
+        graph = FollowGraph.from_database()
+    if current is not None:
+        current.replay(graph)
+    return graph
+
+
+def _reload(current):
+    global _graph, _loader
+    try:
+        graph = load(current)
+        with _load_lock:
+            if current is not None:
+                # The changes recorded while the new index was loading
+                current.replay(graph)
+            _graph = graph
+    finally:
+        _loader = None
+
+
+def _reload_in_background(current):
+    try:
+        _reload(current)
+    except Exception:
+        logger.exception("Could not load the follow graph index")
+    finally:
+        connections.close_all()
+
+
+def get_graph():
+    """Returns the index of this process, or None while the first one loads.
+
+    A missing or expired index is (re)loaded in a background thread, and
+    the current one is returned until the new one is ready.
+    """
+    global _loader
+    graph = _graph
+    if graph is None or graph.expired():
+        background = settings.FOLLOW_GRAPH_LOAD_IN_BACKGROUND
+        with _load_lock:
+            start = _graph is graph and _loader is None
+            if start and background:
+                _loader = threading.Thread(
+                    target=_reload_in_background,
+                    args=(graph,),
+                    name="follow-graph-load",
+                    daemon=True,
+                )
+                _loader.start()
+            elif start:
+                _loader = threading.current_thread()
+        if start and not background:
+            _reload(graph)
+        graph = _graph
+    return graph
+
+
+def reset():
+    """Drops the index of this process; the next use loads it again"""
+    global _graph
+    _graph = None
+
+
+def record(follower_id, following_ids, followed):
+    """Applies follows made or removed by this process to a loaded index"""
+    with _load_lock:
+        graph = _graph
+        if graph is not None:
+            graph.apply(follower_id, following_ids, followed)
+
+
+def _index():
+    """Returns the index to answer from, or None to answer with queries"""
+    if settings.FOLLOW_GRAPH_INDEX:
+        return get_graph()
+    return None
+
+
+def follows(follower_id, following_id):
+    """Returns True if the first profile follows the second"""
+    graph = _index()
+    if graph is not None:
+        return graph.follows(follower_id, following_id)
+    return Follow.objects.filter(
+        follower_id=follower_id, following_id=following_id
+    ).exists()
+
+
+def mutual_followers(first_id, second_id):
+    """Returns the sorted ids of the profiles following both profiles"""
+    graph = _index()
+    if graph is not None:
+        return np.intersect1d(
+            graph.followers(first_id), graph.followers(second_id), assume_unique=True
+        ).tolist()
+    return list(
+        Follow.objects.filter(
+            following_id=first_id,
+            follower_id__in=Follow.objects.filter(following_id=second_id).values(
+                "follower_id"
+            ),
+        )
+        .order_by("follower_id")
+        .values_list("follower_id", flat=True)
+    )
+
+
+def followed_by_friends(viewer_id, profile_id):
+    """Returns the sorted ids of the profiles the viewer follows that follow the profile"""
+    graph = _index()
+    if graph is not None:
+        return np.intersect1d(
+            graph.following(viewer_id), graph.followers(profile_id), assume_unique=True
+        ).tolist()
+    return list(
+        Follow.objects.filter(
+            following_id=profile_id,
+            follower_id__in=Follow.objects.filter(follower_id=viewer_id).values(
+                "following_id"
+            ),
+        )
+        .order_by("follower_id")
+        .values_list("follower_id", flat=True)
+    )
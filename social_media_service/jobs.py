@@ -0,0 +1,138 @@
+"""A small job queue kept in the database, run by ``manage.py run_jobs``.
+
+Functions decorated with ``@job()`` get a ``delay(*args, **kwargs)`` that
+queues a call once the current transaction commits, so a job never sees
+rows its request rolled back and the request returns without waiting for
+it. Arguments must be JSON serializable.
+
+Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it (PostgreSQL); elsewhere (SQLite) each candidate is
+claimed with a conditional UPDATE, which only one worker can win. A failed
+job is retried after JOB_RETRY_DELAY * 2 ** (attempt - 1) seconds until it
+has been tried ``max_attempts`` times and is then kept as failed. Jobs of a
+worker that died are requeued once locked for JOB_LOCK_TIMEOUT seconds.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def job(name=None, max_attempts=3):
+    """Registers a function as a job and gives it a ``delay`` method"""
+
+    def register(func):
+        job_name = name or f"{func.__module__}.{func.__qualname__}"
+        _registry[job_name] = func
+        func.delay = partial(enqueue, job_name, max_attempts=max_attempts)
+        return func
+
+    return register
+
+
+def enqueue(name, *args, max_attempts=3, **kwargs):
+    """Queues a call of the named job once the current transaction commits"""
+    transaction.on_commit(
+        partial(
+            Job.objects.create,
+            name=name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=max_attempts,
+        )
+    )
+
+
+def claim(worker, limit=1):
+    """Marks up to ``limit`` due jobs as running for the worker and returns them"""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by(
+        "run_at", "id"
+    )
+    running = {
+        "status": Job.RUNNING,
+        "locked_at": now,
+        "locked_by": worker,
+        "attempts": F("attempts") + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(
+                due.select_for_update(skip_locked=True).values_list("pk", flat=True)[
+                    :limit
+                ]
+            )
+            Job.objects.filter(pk__in=pks).update(**running)
+    else:
+        pks = [
+            pk
+            for pk in due.values_list("pk", flat=True)[:limit]
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**running)
+        ]
+
+    return list(Job.objects.filter(pk__in=pks).order_by("run_at", "id"))
+
+
+def requeue_stale():
+    """Requeues the jobs of workers that stopped without finishing them"""
+    timeout = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=timeout).update(
+        status=Job.QUEUED, locked_at=None, locked_by=""
+    )
+
+
+def run(job):
+    """Runs a claimed job; deletes it on success, schedules a retry on failure"""
+    try:
+        func = _registry[job.name]
+    except KeyError:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, last_error=f"No job is registered as {job.name}."
+        )
+        logger.error("No job is registered as %s", job.name)
+        return False
+
+    try:
+        func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.name)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, last_error=error)
+        else:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_at=None,
+                locked_by="",
+                last_error=error,
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(worker="inline"):
+    """Runs due jobs in this thread until there are none; returns how many ran"""
+    count = 0
+    while True:
+        claimed = claim(worker)
+        if not claimed:
+            return count
+        for claimed_job in claimed:
+            run(claimed_job)
+            count += 1
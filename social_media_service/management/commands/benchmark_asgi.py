@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from social_media_api.asgi import application
+from social_media_service.models import (
+    Comment,
+    Follow,
+    Like,
+    Post,
+    Profile,
+    TimelineEntry,
+)
+from user.serializers import TokenObtainPairSerializer
+
+EMAIL_PREFIX = "asgi-bench-"
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Compares requests/sec of the read endpoints served by the viewsets "
+        "through the WSGI handler with their async versions served by the "
+        "application in asgi.py, on throwaway data that is deleted afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Requests in flight at once on the ASGI event loop",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["requests"] <= 1000:
+            # Every case uses its own reader to stay under the user throttle
+            raise CommandError("--requests must be between 1 and 1000.")
+
+        get_user_model().objects.filter(email__startswith=EMAIL_PREFIX).delete()
+        try:
+            # Requests are made for the host "testserver"
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                self.run(options["rows"], options["requests"], options["concurrency"])
+        finally:
+            get_user_model().objects.filter(email__startswith=EMAIL_PREFIX).delete()
+
+    def create_profiles(self, prefix, count):
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(email=f"{EMAIL_PREFIX}{prefix}-{index}@bench.com")
+            for index in range(count)
+        )
+        return Profile.objects.bulk_create(
+            Profile(user=user, username=f"asgi_bench_{prefix}_{index}")
+            for index, user in enumerate(users)
+        )
+
+    def seed(self, rows):
+        hub, *profiles = self.create_profiles("profile", rows + 1)
+        posts = Post.objects.bulk_create(
+            Post(author=profile, title=f"asgi bench {index}", content="")
+            for index, profile in enumerate(profiles)
+        )
+        Follow.objects.bulk_create(
+            Follow(follower=profile, following=hub) for profile in profiles
+        )
+        Follow.objects.bulk_create(
+            Follow(follower=hub, following=profile) for profile in profiles
+        )
+        Like.objects.bulk_create(Like(profile=hub, post=post) for post in posts)
+        Comment.objects.bulk_create(
+            Comment(post=posts[0], profile=profile, text="asgi bench")
+            for profile in profiles
+        )
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(
+                owner=hub,
+                post=post,
+                author_id=post.author_id,
+                created_at=post.created_at,
+            )
+            for post in posts
+        )
+        return hub, posts[0]
+
+    def run(self, rows, requests, concurrency):
+        hub, post = self.seed(rows)
+        cases = [
+            ("post-list", []),
+            ("post-detail", [post.pk]),
+            ("post-comments", [post.pk]),
+            ("profile-followers", [hub.pk]),
+            ("profile-following", [hub.pk]),
+            ("profile-following-posts", [hub.pk]),
+            ("profile-liked-posts", [hub.pk]),
+        ]
+        readers = iter(self.create_profiles("reader", len(cases) * 2))
+
+        self.stdout.write(
+            f"{'endpoint':<26}{'wsgi req/s':>12}{'asgi req/s':>12}{'speedup':>10}"
+        )
+        for name, args in cases:
+            sync_url = reverse(f"social_media_service:{name}", args=args)
+            async_url = reverse(f"social_media_service:async:{name}", args=args)
+
+            wsgi_rate = self.measure_wsgi(sync_url, self.token(next(readers)), requests)
+            asgi_rate = asyncio.run(
+                self.measure_asgi(
+                    async_url, self.token(next(readers)), requests, concurrency
+                )
+            )
+            self.stdout.write(
+                f"{name:<26}{wsgi_rate:>12,.0f}{asgi_rate:>12,.0f}"
+                f"{asgi_rate / wsgi_rate:>9.2f}x"
+            )
+
+    def token(self, profile):
+        return str(TokenObtainPairSerializer.get_token(profile.user).access_token)
+
+    def measure_wsgi(self, url, token, requests):
+        """One request at a time, as a synchronous worker serves them"""
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        started = time.perf_counter()
+        for _ in range(requests):
+            self.expect_ok(client.get(url).status_code, url)
+        return requests / (time.perf_counter() - started)
+
+    async def measure_asgi(self, url, token, requests, concurrency):
+        """Up to ``concurrency`` requests at a time on one event loop"""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url,
+            "raw_path": url.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", f"Bearer {token}".encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        slots = asyncio.Semaphore(concurrency)
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def fetch():
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            async with slots:
+                await application(dict(scope), receive, send)
+            self.expect_ok(messages[0]["status"], url)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        return requests / (time.perf_counter() - started)
+
+    def expect_ok(self, status, url):
+        if status != 200:
+            raise CommandError(f"GET {url} answered {status}.")
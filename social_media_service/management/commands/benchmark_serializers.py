@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_media_service.benchmarking import measure
+from social_media_service.fast_serializers import (
+    FastFollowerListSerializer,
+    FastFollowingListSerializer,
+    FastLikeListSerializer,
+    FastPostListSerializer,
+)
+from social_media_service.models import Follow, Like, Post, Profile
+from social_media_service.serializers import (
+    FollowerListSerializer,
+    FollowingListSerializer,
+    LikeListSerializer,
+    PostListSerializer,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Compares rows/sec of the ModelSerializer list serializers with their "
+        "values_list() fast paths on throwaway data that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["rows"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(email=f"serializer-bench-{index}@bench.com") for index in range(rows)
+        )
+        profiles = Profile.objects.bulk_create(
+            Profile(user=user, username=f"serializer_bench_{index}")
+            for index, user in enumerate(users)
+        )
+        hub = profiles[0]
+        posts = Post.objects.bulk_create(
+            Post(author=profile, title=f"serializer bench {index}", content="")
+            for index, profile in enumerate(profiles)
+        )
+        Follow.objects.bulk_create(
+            Follow(follower=profile, following=hub) for profile in profiles[1:]
+        )
+        Follow.objects.bulk_create(
+            Follow(follower=hub, following=profile) for profile in profiles[1:]
+        )
+        Like.objects.bulk_create(Like(profile=hub, post=post) for post in posts)
+        return hub, [post.pk for post in posts]
+
+    def run(self, rows, repeat):
+        hub, post_ids = self.seed(rows)
+        cases = [
+            (
+                "posts",
+                PostListSerializer,
+                FastPostListSerializer,
+                Post.objects.filter(pk__in=post_ids).select_related("author"),
+            ),
+            (
+                "likes",
+                LikeListSerializer,
+                FastLikeListSerializer,
+                hub.likes.select_related("profile", "post"),
+            ),
+            (
+                "followers",
+                FollowerListSerializer,
+                FastFollowerListSerializer,
+                hub.followers.select_related("follower"),
+            ),
+            (
+                "following",
+                FollowingListSerializer,
+                FastFollowingListSerializer,
+                hub.following.select_related("following"),
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'endpoint':<12}{'rows':>8}{'model rows/s':>16}"
+            f"{'fast rows/s':>16}{'speedup':>10}"
+        )
+        for name, serializer_class, fast_class, queryset in cases:
+            queryset = queryset.order_by("-created_at", "-id")
+            expected = serializer_class(queryset, many=True).data
+            actual = fast_class(fast_class.rows_for(queryset)).data
+            if [dict(item) for item in expected] != actual:
+                raise CommandError(f"{fast_class.__name__} output differs.")
+
+            model_time = min(
+                measure(
+                    lambda: serializer_class(queryset.all(), many=True).data, repeat
+                )
+            )
+            fast_time = min(
+                measure(lambda: fast_class(fast_class.rows_for(queryset)).data, repeat)
+            )
+            count = len(expected)
+            self.stdout.write(
+                f"{name:<12}{count:>8}{count / model_time:>16,.0f}"
+                f"{count / fast_time:>16,.0f}{model_time / fast_time:>9.1f}x"
+            )
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from social_media_service.models import FollowSuggestion
+from social_media_service.suggestions import follow_graph, two_hop
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Recomputes the follow suggestions of every profile from the whole "
+        "follow graph, ranking the profiles followed by its followees by how "
+        "many of them follow each"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Number of profiles whose suggestions are computed at once",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=settings.SUGGESTIONS_PER_PROFILE,
+            help="Number of suggestions kept per profile",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ids, indptr, indices = follow_graph()
+        batch_size = options["batch_size"]
+        created = 0
+
+        for start in range(0, len(ids), batch_size):
+            stop = min(start + batch_size, len(ids))
+            sources, targets, scores = two_hop(
+                indptr, indices, start, stop, options["limit"]
+            )
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(
+                    profile_id__gte=ids[start], profile_id__lte=ids[stop - 1]
+                ).delete()
+                FollowSuggestion.objects.bulk_create(
+                    (
+                        FollowSuggestion(
+                            profile_id=profile_id,
+                            suggested_id=suggested_id,
+                            score=score,
+                        )
+                        for profile_id, suggested_id, score in zip(
+                            ids[sources].tolist(),
+                            ids[targets].tolist(),
+                            scores.tolist(),
+                        )
+                    ),
+                    batch_size=batch_size,
+                )
+            created += len(sources)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Computed {created} suggestions for {len(ids)} profiles "
+                f"in {elapsed:.1f}s."
+            )
+        )
@@ -0,0 +1,278 @@
+import random
+import time
+from array import array
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from social_media_service.models import (
+    Comment,
+    Follow,
+    Like,
+    Post,
+    Profile,
+    TimelineEntry,
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Generates users, profiles, posts, follows, likes and comments in bulk. "
+        "How many profiles a profile is followed by follows a power law, and "
+        "popular profiles also get most likes and comments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument(
+            "--posts", type=float, default=5, help="Mean posts per user"
+        )
+        parser.add_argument(
+            "--follows", type=float, default=20, help="Mean follows per user"
+        )
+        parser.add_argument(
+            "--likes", type=float, default=10, help="Mean likes per user"
+        )
+        parser.add_argument(
+            "--comments", type=float, default=1, help="Mean comments per post"
+        )
+        parser.add_argument(
+            "--zipf-exponent",
+            type=float,
+            default=1.0,
+            help="Exponent of the power law that ranks profiles by popularity",
+        )
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument(
+            "--prefix",
+            default="gen",
+            help="Prefix of the generated e-mails, usernames and post titles",
+        )
+        parser.add_argument(
+            "--password", default="generated", help="Password of every user"
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"]
+        self.random = random.Random(options["seed"])
+
+        if (
+            get_user_model()
+            .objects.filter(email__startswith=f"{self.prefix}-")
+            .exists()
+        ):
+            raise CommandError(
+                f"Data with the prefix {self.prefix!r} exists, pass another --prefix."
+            )
+
+        users = options["users"]
+        self.profile_ids = self.create_profiles(users, options["password"])
+        self.popularity = self.rank_profiles(users, options["zipf_exponent"])
+        followers = self.create_follows(options["follows"])
+        self.create_posts(options["posts"], followers)
+        self.create_likes(options["likes"])
+        self.create_comments(options["comments"])
+        self.fill_timelines()
+
+        self.step("Reconciling counters")
+        call_command("reconcile_counters", stdout=self.stdout)
+
+    def step(self, message):
+        self.stdout.write(message)
+        self.started = time.perf_counter()
+
+    def done(self, rows, name):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  {rows:,} {name} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f}/s)"
+            )
+        )
+
+    def bulk_create(self, model, objects, **kwargs):
+        created = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+        return created
+
+    def create_profiles(self, count, password):
+        """Creates the users and their profiles; returns the profile ids"""
+        self.step("Creating users and profiles")
+        User = get_user_model()
+        password = make_password(password)
+        profile_ids = array("q")
+
+        for batch in batched(range(count), self.batch_size):
+            emails = [f"{self.prefix}-{index}@example.com" for index in batch]
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    User(email=email, password=password) for email in emails
+                )
+                user_ids = dict(
+                    User.objects.filter(email__in=emails).values_list("email", "id")
+                )
+                Profile.objects.bulk_create(
+                    Profile(
+                        user_id=user_ids[email],
+                        username=f"{self.prefix}_{index}",
+                        first_name="Generated",
+                        last_name=str(index),
+                    )
+                    for index, email in zip(batch, emails)
+                )
+            profiles = dict(
+                Profile.objects.filter(user_id__in=user_ids.values()).values_list(
+                    "user_id", "id"
+                )
+            )
+            profile_ids.extend(profiles[user_ids[email]] for email in emails)
+
+        self.done(count, "users and profiles")
+        return profile_ids
+
+    def rank_profiles(self, count, exponent):
+        """Gives profiles random popularity ranks, weighted 1 / rank ** exponent"""
+        order = list(range(count))
+        self.random.shuffle(order)
+        weights = accumulate(1 / rank**exponent for rank in range(1, count + 1))
+        return order, list(weights)
+
+    def popular(self, count):
+        """Returns profile indexes drawn with the power-law weights"""
+        order, cum_weights = self.popularity
+        return self.random.choices(order, cum_weights=cum_weights, k=count)
+
+    def create_follows(self, mean):
+        """Creates the follows; returns the follower count of every profile index"""
+        self.step("Creating follows")
+        count = len(self.profile_ids)
+        followers = array("q", bytes(8 * count))
+
+        def follows():
+            for index, profile_id in enumerate(self.profile_ids):
+                wanted = min(round(self.random.expovariate(1 / mean)), count - 1)
+                targets = set()
+                # Popular profiles are drawn again and again, so top up a few times
+                for _ in range(3):
+                    if len(targets) >= wanted:
+                        break
+                    targets.update(self.popular(wanted - len(targets)))
+                    targets.discard(index)
+                for target in targets:
+                    followers[target] += 1
+                    yield Follow(
+                        follower_id=profile_id, following_id=self.profile_ids[target]
+                    )
+
+        self.done(self.bulk_create(Follow, follows(), ignore_conflicts=True), "follows")
+        return followers
+
+    def create_posts(self, mean, followers):
+        """Creates the posts of each profile, remembering their ids per profile"""
+        self.step("Creating posts")
+        pulled = settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        self.post_ids = array("q")
+        self.post_offsets = array("q", [0])
+        created = 0
+
+        for batch in batched(range(len(self.profile_ids)), self.batch_size):
+            posts = [
+                Post(
+                    author_id=self.profile_ids[index],
+                    title=f"{self.prefix} post {index}-{number}",
+                    content="Generated content.",
+                    fanout_skipped=followers[index] >= pulled,
+                )
+                for index in batch
+                for number in range(round(self.random.expovariate(1 / mean)))
+            ]
+            Post.objects.bulk_create(posts, batch_size=self.batch_size)
+            created += len(posts)
+
+            ids = {index: [] for index in batch}
+            positions = {self.profile_ids[index]: index for index in batch}
+            rows = (
+                Post.objects.filter(author_id__in=positions)
+                .order_by("id")
+                .values_list("author_id", "id")
+            )
+            for author_id, post_id in rows:
+                ids[positions[author_id]].append(post_id)
+            for index in batch:
+                self.post_ids.extend(ids[index])
+                self.post_offsets.append(len(self.post_ids))
+
+        self.done(created, "posts")
+
+    def popular_post(self):
+        """Returns the id of a post of a profile drawn with the power-law weights"""
+        while True:
+            (index,) = self.popular(1)
+            start, end = self.post_offsets[index], self.post_offsets[index + 1]
+            if start < end:
+                return self.post_ids[self.random.randrange(start, end)]
+
+    def create_likes(self, mean):
+        self.step("Creating likes")
+        if not self.post_ids:
+            return self.done(0, "likes")
+
+        def likes():
+            for profile_id in self.profile_ids:
+                wanted = min(
+                    round(self.random.expovariate(1 / mean)), len(self.post_ids)
+                )
+                for post_id in {self.popular_post() for _ in range(wanted)}:
+                    yield Like(profile_id=profile_id, post_id=post_id)
+
+        self.done(self.bulk_create(Like, likes(), ignore_conflicts=True), "likes")
+
+    def create_comments(self, mean):
+        self.step("Creating comments")
+        total = round(len(self.post_ids) * mean)
+
+        comments = (
+            Comment(
+                post_id=self.popular_post(),
+                profile_id=self.random.choice(self.profile_ids),
+                text="Generated comment.",
+            )
+            for _ in range(total)
+        )
+        self.done(self.bulk_create(Comment, comments), "comments")
+
+    def fill_timelines(self):
+        """Fans the posts out to the followers of their authors, like new posts are"""
+        self.step("Filling timelines")
+        timeline = TimelineEntry._meta.db_table
+        follow = Follow._meta.db_table
+        post = Post._meta.db_table
+        created = 0
+
+        for batch in batched(self.profile_ids, self.batch_size):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {timeline} (owner_id, post_id, author_id, created_at) "
+                    f"SELECT f.follower_id, p.id, p.author_id, p.created_at "
+                    f"FROM {follow} f JOIN {post} p ON p.author_id = f.following_id "
+                    f"WHERE p.author_id IN ({', '.join(['%s'] * len(batch))}) "
+                    f"AND NOT p.fanout_skipped",
+                    batch,
+                )
+                created += cursor.rowcount
+
+        self.done(created, "timeline entries")
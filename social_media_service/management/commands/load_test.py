@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from social_media_service.benchmarking import summarize
+from social_media_service.models import Post, Profile
+from user.serializers import TokenObtainPairSerializer
+
+# (weight, name, method, route, kind of the route argument)
+MIX = (
+    (30, "timeline", "get", "profile-following-posts", "self"),
+    (15, "posts", "get", "post-list", None),
+    (15, "post", "get", "post-detail", "post"),
+    (10, "comments", "get", "post-comments", "post"),
+    (10, "profile", "get", "profile-detail", "profile"),
+    (5, "followers", "get", "profile-followers", "profile"),
+    (5, "following", "get", "profile-following", "profile"),
+    (5, "like", "post", "post-like", "post"),
+    (3, "comment", "post", "post-add-comment", "post"),
+    (2, "follow", "post", "profile-follow", "profile"),
+)
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Replays a weighted mix of API calls made by users created with "
+        "generate_data from several threads, then reports the throughput and "
+        "the latency percentiles of each call"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=200,
+            help="Number of generated users the calls are spread over",
+        )
+        parser.add_argument(
+            "--prefix", default="gen", help="Prefix given to generate_data"
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        users = list(
+            get_user_model()
+            .objects.filter(email__startswith=f"{options['prefix']}-")
+            .select_related("profile")
+            .order_by("?")[: options["users"]]
+        )
+        if not users:
+            raise CommandError("No generated users found, run generate_data first.")
+
+        self.tokens = [
+            (user.profile.pk, TokenObtainPairSerializer.get_token(user).access_token)
+            for user in users
+        ]
+        self.profile_range = self.id_range(Profile)
+        self.post_range = self.id_range(Post)
+        weights = [call[0] for call in MIX]
+        plan = [
+            (rng.choice(self.tokens), rng.choices(MIX, weights)[0], rng.random())
+            for _ in range(options["requests"])
+        ]
+
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock = threading.Lock()
+        step = options["threads"]
+        threads = [
+            threading.Thread(target=self.worker, args=(plan[index::step],))
+            for index in range(step)
+        ]
+
+        started = time.perf_counter()
+        # Requests are made for the test client's host name
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.report(len(plan), elapsed)
+
+    def id_range(self, model):
+        bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            raise CommandError(f"There are no {model._meta.verbose_name_plural}.")
+        return bounds["low"], bounds["high"]
+
+    def url(self, call, profile_id, draw):
+        _, _, _, route, kind = call
+        if kind is None:
+            args = []
+        elif kind == "self":
+            args = [profile_id]
+        else:
+            low, high = self.post_range if kind == "post" else self.profile_range
+            args = [low + int(draw * (high - low + 1))]
+        return reverse(f"social_media_service:{route}", args=args)
+
+    def worker(self, plan):
+        client = Client()
+        try:
+            for (profile_id, token), call, draw in plan:
+                name, method = call[1], call[2]
+                data = {"text": "Load test comment."} if name == "comment" else {}
+                url = self.url(call, profile_id, draw)
+
+                started = time.perf_counter()
+                response = getattr(client, method)(
+                    url, data, HTTP_AUTHORIZATION=f"Bearer {token}"
+                )
+                duration = time.perf_counter() - started
+
+                with self.lock:
+                    self.samples[name].append(duration)
+                    self.statuses[name][response.status_code] += 1
+        finally:
+            connections.close_all()
+
+    def report(self, count, elapsed):
+        self.stdout.write(
+            f"{count} requests in {elapsed:.2f}s: {count / elapsed:,.0f} req/s"
+        )
+        self.stdout.write(
+            f"{'call':<12}{'count':>7}{'mean ms':>10}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}  statuses"
+        )
+        everything = []
+        for _, name, *_ in MIX:
+            samples = self.samples.get(name)
+            if not samples:
+                continue
+            everything.extend(samples)
+            self.write_row(name, samples, self.statuses[name])
+        self.write_row("all", everything, sum(self.statuses.values(), Counter()))
+
+    def write_row(self, name, samples, statuses):
+        stats = summarize(samples)
+        codes = " ".join(f"{code}x{total}" for code, total in sorted(statuses.items()))
+        self.stdout.write(
+            f"{name:<12}{stats['count']:>7}{stats['mean_ms']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{stats['p99_ms']:>10.1f}  {codes}"
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from social_media_service import object_cache
+from social_media_service.counters import RECONCILERS
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Recomputes the denormalized like, comment, follow and post counters"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5_000,
+            help="Number of primary keys recomputed per UPDATE statement",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        for model, reconcile in RECONCILERS:
+            bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+            if bounds["low"] is None:
+                continue
+
+            updated = 0
+            for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+                updated += reconcile(
+                    model.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                )
+                object_cache.invalidate(model, *range(start, start + batch_size))
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Reconciled counters of {updated} {model._meta.verbose_name_plural}."
+                )
+            )
@@ -0,0 +1,74 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from social_media_service import jobs
+
+logger = logging.getLogger("social_media_service.jobs")
+
+
+class Command(BaseCommand):
+    help = "Runs the jobs queued with social_media_service.jobs"  # noqa: VNE003
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Number of jobs run at the same time, each in its own thread",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Seconds to wait before looking again when no job is due",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        slots = threading.BoundedSemaphore(concurrency)
+        ran = 0
+
+        def run(job):
+            try:
+                jobs.run(job)
+            except Exception:
+                # The job stays running and is requeued after JOB_LOCK_TIMEOUT
+                logger.exception("Could not record the outcome of job %s", job.pk)
+            finally:
+                connections.close_all()
+                slots.release()
+
+        self.stdout.write(f"Worker {worker} running {concurrency} jobs at a time.")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    jobs.requeue_stale()
+                    slots.acquire()
+                    claimed = jobs.claim(worker)
+                    if not claimed:
+                        slots.release()
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+
+                    executor.submit(run, claimed[0])
+                    ran += 1
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping once the running jobs finish.")
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from social_media_service.graph_index import FollowGraph
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Writes the follow graph index to a file that API processes memory-map "
+        "on startup instead of loading the graph from the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=settings.FOLLOW_GRAPH_SNAPSHOT,
+            help="Snapshot file, FOLLOW_GRAPH_SNAPSHOT by default",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("Pass --path or set FOLLOW_GRAPH_SNAPSHOT.")
+
+        started = time.perf_counter()
+        graph = FollowGraph.from_database()
+        graph.save(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(graph.out_indices)} follows between {len(graph.ids)} "
+                f"profiles to {path} in {time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -1,11 +1,19 @@
 # Generated by Django 4.2.2 on 2023-06-22 15:16
 
 from django.core.management import call_command
+from django.core.serializers import python as python_serializer
 from django.db import migrations
 
 
 def func(apps, schema_editor):
-    call_command("loaddata", "social_media_service.json")
+    # Deserialize the fixture against the historical models, otherwise
+    # fields added by later migrations would be inserted before they exist.
+    global_apps = python_serializer.apps
+    python_serializer.apps = apps
+    try:
+        call_command("loaddata", "social_media_service.json")
+    finally:
+        python_serializer.apps = global_apps
 
 
 def reverse_func(apps, schema_editor):
@@ -0,0 +1,111 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def materialize_timelines(apps, schema_editor):
+    Follow = apps.get_model("social_media_service", "Follow")
+    Post = apps.get_model("social_media_service", "Post")
+    TimelineEntry = apps.get_model("social_media_service", "TimelineEntry")
+
+    for follower_id, following_id in Follow.objects.values_list(
+        "follower_id", "following_id"
+    ).iterator():
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=follower_id,
+                    post_id=post_id,
+                    author_id=following_id,
+                    created_at=created_at,
+                )
+                for post_id, created_at in Post.objects.filter(
+                    author_id=following_id
+                ).values_list("id", "created_at")
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0003_auto_20230705_1445"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="fanout_skipped",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanout_skipped", True)),
+                fields=["author", "-created_at"],
+                name="post_pulled_author_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="timelineentry",
+            name="author",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="social_media_service.profile",
+            ),
+        ),
+        migrations.AddField(
+            model_name="timelineentry",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="timeline_entries",
+                to="social_media_service.profile",
+            ),
+        ),
+        migrations.AddField(
+            model_name="timelineentry",
+            name="post",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="timeline_entries",
+                to="social_media_service.post",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "-created_at"], name="timeline_owner_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "author"], name="timeline_owner_author_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "post"), name="unique_timeline_entry"
+            ),
+        ),
+        migrations.RunPython(materialize_timelines, migrations.RunPython.noop),
+    ]
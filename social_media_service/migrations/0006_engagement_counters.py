@@ -0,0 +1,71 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+def populate_counters(apps, schema_editor):
+    Profile = apps.get_model("social_media_service", "Profile")
+    Post = apps.get_model("social_media_service", "Post")
+    Follow = apps.get_model("social_media_service", "Follow")
+    Like = apps.get_model("social_media_service", "Like")
+    Comment = apps.get_model("social_media_service", "Comment")
+
+    Post.objects.update(
+        likes_count=count(Like, "post"),
+        comments_count=count(Comment, "post"),
+    )
+    Profile.objects.update(
+        followers_count=count(Follow, "following"),
+        following_count=count(Follow, "follower"),
+        posts_count=count(Post, "author"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0005_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="posts_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:39
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicates(model, fields, counters):
+    duplicates = (
+        model.objects.values(*fields)
+        .annotate(total=Count("id"), keep=Min("id"))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = duplicate["total"] - 1
+        model.objects.filter(**{field: duplicate[field] for field in fields}).exclude(
+            id=duplicate["keep"]
+        ).delete()
+        for counted_model, field, counter in counters:
+            counted_model.objects.filter(pk=duplicate[field]).update(
+                **{counter: F(counter) - extra}
+            )
+
+
+def deduplicate(apps, schema_editor):
+    Profile = apps.get_model("social_media_service", "Profile")
+    Post = apps.get_model("social_media_service", "Post")
+    Follow = apps.get_model("social_media_service", "Follow")
+    Like = apps.get_model("social_media_service", "Like")
+
+    remove_duplicates(
+        Follow,
+        ["follower", "following"],
+        [
+            (Profile, "follower", "following_count"),
+            (Profile, "following", "followers_count"),
+        ],
+    )
+    remove_duplicates(Like, ["profile", "post"], [(Post, "post", "likes_count")])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0006_engagement_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.UniqueConstraint(
+                fields=("follower", "following"), name="unique_follow"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.UniqueConstraint(
+                fields=("profile", "post"), name="unique_like"
+            ),
+        ),
+    ]
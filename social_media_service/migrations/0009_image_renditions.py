@@ -0,0 +1,22 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0008_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="media_renditions",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="profile_picture_renditions",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:33
+
+import math
+
+from django.db import migrations, models
+import social_media_service.trending
+
+BATCH_SIZE = 1_000
+
+
+def populate_scores(apps, schema_editor):
+    Post = apps.get_model("social_media_service", "Post")
+    Like = apps.get_model("social_media_service", "Like")
+    Comment = apps.get_model("social_media_service", "Comment")
+    event_score = social_media_service.trending.event_score
+
+    scores = {
+        pk: event_score("post", created_at)
+        for pk, created_at in Post.objects.values_list("pk", "created_at").iterator()
+    }
+    for model, event in ((Like, "like"), (Comment, "comment")):
+        rows = model.objects.values_list("post_id", "created_at").iterator()
+        for post_id, created_at in rows:
+            score, term = scores[post_id], event_score(event, created_at)
+            scores[post_id] = max(score, term) + math.log1p(
+                math.exp(-abs(score - term))
+            )
+
+    Post.objects.bulk_update(
+        [Post(pk=pk, trending_score=score) for pk, score in scores.items()],
+        ["trending_score"],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0011_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="trending_score",
+            field=models.FloatField(
+                default=social_media_service.trending.initial_score, editable=False
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-trending_score", "-id"], name="post_trending_idx"
+            ),
+        ),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media_service", "0014_comment_threads"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="post",
+            name="post_pulled_author_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="timelineentry",
+            name="timeline_owner_recent_idx",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("fanout_skipped", True)),
+                fields=["author", "-created_at", "-id"],
+                name="post_pulled_author_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "-created_at", "-post"],
+                name="timeline_owner_recent_idx",
+            ),
+        ),
+    ]
@@ -1,10 +1,14 @@
 import os
 import uuid
 
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import F
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
 from django.utils.text import slugify
 
 from user.models import User
+from . import trending
 
 
 def profile_image_file_path(instance, filename):
@@ -14,7 +18,28 @@ def profile_image_file_path(instance, filename):
     return os.path.join("uploads/profile_image/", filename)
 
 
-class Profile(models.Model):
+class VersionedModel(models.Model):
+    """A model whose ``version`` changes on every write, for use as an ETag"""
+
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        self.version = F("version") + 1
+        super().save(*args, **kwargs)
+        # Deferred, so that it is only read back if something asks for it
+        del self.version
+
+
+class Profile(VersionedModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     username = models.CharField(
         unique=True,
@@ -31,6 +56,10 @@ class Profile(models.Model):
         upload_to=profile_image_file_path, null=True, blank=True
     )
     bio = models.TextField(blank=True)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    profile_picture_renditions = models.JSONField(default=dict, editable=False)
 
     def __str__(self):
         return f"{self.username}"
@@ -47,12 +76,140 @@ def post_image_file_path(instance, filename):
     return os.path.join("uploads/post_image/", filename)
 
 
-class Post(models.Model):
+class Post(VersionedModel):
     author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="posts")
     title = models.CharField(max_length=255, unique=True)
     content = models.TextField()
     media = models.ImageField(upload_to=post_image_file_path, null=True, blank=True)
+    media_renditions = models.JSONField(default=dict, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    fanout_skipped = models.BooleanField(default=False, editable=False)
+    trending_score = models.FloatField(default=trending.initial_score, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_recent_idx"),
+            models.Index(fields=["-trending_score", "-id"], name="post_trending_idx"),
+            models.Index(
+                fields=["author", "-created_at", "-id"], name="post_author_recent_idx"
+            ),
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="post_pulled_author_idx",
+                condition=models.Q(fanout_skipped=True),
+            ),
+        ]
+
+
+class UniqueRowManager(models.Manager):
+    def insert_ignore(self, **values):
+        """Inserts a row with a single INSERT ... ON CONFLICT DO NOTHING statement.
+
+        Returns True if the row was written, False if it already existed.
+        """
+        instance = self.model(**values)
+        fields = [field for field in self.model._meta.local_concrete_fields]
+        fields.remove(self.model._meta.pk)
+        query = InsertQuery(self.model, ignore_conflicts=True)
+        query.insert_values(fields, [instance])
+
+        using = self._db or router.db_for_write(self.model)
+        with connections[using].cursor() as cursor:
+            for sql, params in query.get_compiler(using).as_sql():
+                cursor.execute(sql, params)
+            return cursor.rowcount > 0
+
+    def insert_ignore_many(self, instances, returning):
+        """Inserts rows with INSERT ... ON CONFLICT DO NOTHING ... RETURNING statements.
+
+        Returns the values of the ``returning`` field of the rows written,
+        leaving out those that already existed.
+        """
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        fields = [field for field in self.model._meta.local_concrete_fields]
+        fields.remove(self.model._meta.pk)
+        if not connection.features.can_return_columns_from_insert:
+            return [
+                getattr(instance, returning)
+                for instance in instances
+                if self.insert_ignore(
+                    **{
+                        field.attname: getattr(instance, field.attname)
+                        for field in fields
+                    }
+                )
+            ]
+
+        field = self.model._meta.get_field(returning)
+        column = connection.ops.quote_name(field.column)
+        batch_size = max(connection.ops.bulk_batch_size(fields, instances), 1)
+        rows = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(instances), batch_size):
+                stop = start + batch_size
+                query = InsertQuery(self.model, ignore_conflicts=True)
+                query.insert_values(fields, instances[start:stop])
+                for sql, params in query.get_compiler(using).as_sql():
+                    cursor.execute(f"{sql} RETURNING {column}", params)
+                    rows += cursor.fetchall()
+        return [values[0] for values in _converted(connection, [field], rows)]
+
+    def delete_returning(self, *names, **filters):
+        """Deletes the rows matching ``filters`` with a DELETE ... RETURNING statement.
+
+        Returns a tuple of the values of the fields ``names`` for each row
+        deleted. Backends without RETURNING delete the rows they lock.
+        """
+        queryset = self.filter(**filters)
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        # Backends returning columns from INSERT return them from DELETE as well
+        if not connection.features.can_return_columns_from_insert:
+            with transaction.atomic(using=using):
+                rows = list(
+                    queryset.using(using).select_for_update().values_list("pk", *names)
+                )
+                queryset.filter(pk__in=[row[0] for row in rows]).delete()
+            return [row[1:] for row in rows]
+
+        fields = [self.model._meta.get_field(name) for name in names]
+        quote = connection.ops.quote_name
+        where, params = queryset.query.get_compiler(using).compile(queryset.query.where)
+        sql = "DELETE FROM {} WHERE {} RETURNING {}".format(
+            quote(self.model._meta.db_table),
+            where,
+            ", ".join(quote(field.column) for field in fields),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return _converted(connection, fields, rows)
+
+
+def _converted(connection, fields, rows):
+    """Turns raw column values into what the fields hold, as a query would"""
+    converters = []
+    for field in fields:
+        column = field.get_col(field.model._meta.db_table)
+        converters.append(
+            (
+                connection.ops.get_db_converters(column)
+                + column.get_db_converters(connection),
+                column,
+            )
+        )
+    converted = []
+    for row in rows:
+        values = []
+        for value, (functions, column) in zip(row, converters):
+            for function in functions:
+                value = function(value, column, connection)
+            values.append(value)
+        converted.append(tuple(values))
+    return converted
 
 
 class Follow(models.Model):
@@ -64,17 +221,170 @@ class Follow(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UniqueRowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["follower", "following"], name="unique_follow"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["follower", "-created_at", "-id"],
+                name="follow_follower_recent_idx",
+            ),
+            models.Index(
+                fields=["following", "-created_at", "-id"],
+                name="follow_following_recent_idx",
+            ),
+        ]
+
 
 class Like(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="likes")
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="likes")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UniqueRowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["profile", "post"], name="unique_like"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["profile", "-created_at", "-id"], name="like_profile_recent_idx"
+            ),
+        ]
+
 
-class Comment(models.Model):
+class Comment(VersionedModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     profile = models.ForeignKey(
         Profile, on_delete=models.CASCADE, related_name="comments"
     )
+    # The top-level comment a reply belongs to; replies are not nested further
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        related_name="replies",
+        null=True,
+        blank=True,
+    )
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="comment_post_top_idx",
+                condition=models.Q(parent__isnull=True),
+            ),
+            models.Index(
+                fields=["parent", "created_at", "id"], name="comment_thread_idx"
+            ),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """A profile followed by ``score`` of the profiles ``profile`` follows, see suggestions.py"""
+
+    profile = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="suggestions"
+    )
+    suggested = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "suggested"], name="unique_suggestion"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["profile", "-score", "suggested"],
+                name="suggestion_profile_rank_idx",
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into the home timeline of one of its author's followers"""
+
+    owner = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-post"],
+                name="timeline_owner_recent_idx",
+            ),
+            models.Index(fields=["owner", "author"], name="timeline_owner_author_idx"),
+        ]
+
+
+class UploadSession(models.Model):
+    """A resumable upload whose chunks are appended straight to its file"""
+
+    id = models.UUIDField(  # noqa: VNE003
+        primary_key=True, default=uuid.uuid4, editable=False
+    )
+    profile = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="uploads"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0, editable=False)
+    completed = models.BooleanField(default=False, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Storage name of the file the chunks are written to"""
+        return os.path.join("uploads/sessions/", str(self.id))
+
+
+class Job(models.Model):
+    """A deferred call run by the ``run_jobs`` worker, see jobs.py"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at", "id"], name="job_ready_idx"),
+        ]
@@ -0,0 +1,110 @@
+"""Read-through cache of hot Profile and Post rows and their representations.
+
+Instances are cached under ``object:<model>:<pk>`` together with a random
+token drawn when the row is loaded; serialized representations are cached
+under keys that include that token, so invalidating the instance also
+orphans every representation built from it. Invalidation happens on
+``post_save``/``post_delete`` (see signals.py) and wherever rows are updated
+in bulk. All keys carry ``OBJECT_CACHE_VERSION``: bump it when a serializer
+changes shape. The local-memory backend bounds the cache with MAX_ENTRIES
+and evicts the least recently used keys first. Misses are read from the
+primary database, so a lagging read replica cannot put a stale row in the
+cache for OBJECT_CACHE_TIMEOUT seconds.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+
+def _key(model, pk):
+    return f"object:{model._meta.label_lower}:{pk}"
+
+
+def _set(key, value):
+    cache.set(
+        key,
+        value,
+        timeout=settings.OBJECT_CACHE_TIMEOUT,
+        version=settings.OBJECT_CACHE_VERSION,
+    )
+
+
+def get_object(queryset, pk):
+    """Returns the instance with the given pk from the cache or the queryset.
+
+    Returns None if the pk is malformed or no such row exists.
+    """
+    model = queryset.model
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+
+    key = _key(model, pk)
+    entry = cache.get(key, version=settings.OBJECT_CACHE_VERSION)
+    if entry is None:
+        instance = queryset.using(DEFAULT_DB_ALIAS).filter(pk=pk).first()
+        if instance is None:
+            return None
+        entry = (uuid.uuid4().hex, instance)
+        _set(key, entry)
+
+    token, instance = entry
+    instance._object_cache_token = token
+    return instance
+
+
+def get_data(serializer):
+    """Returns ``serializer.data``, cached if the instance came from the cache"""
+    instance = serializer.instance
+    token = getattr(instance, "_object_cache_token", None)
+    if token is None:
+        return serializer.data
+
+    # Representations with absolute URLs depend on the host they were built for
+    request = serializer.context.get("request")
+    base_url = request.build_absolute_uri("/") if request else ""
+    variant = hashlib.md5(base_url.encode()).hexdigest()[:12]
+    key = f"{_key(type(instance), instance.pk)}:{token}:{type(serializer).__name__}:{variant}"
+
+    data = cache.get(key, version=settings.OBJECT_CACHE_VERSION)
+    if data is None:
+        data = serializer.data
+        _set(key, data)
+    return data
+
+
+def invalidate(model, *pks):
+    """Drops the cached instances (and so their representations) of the rows"""
+    cache.delete_many(
+        [_key(model, pk) for pk in pks], version=settings.OBJECT_CACHE_VERSION
+    )
+
+
+class CachedObjectMixin:
+    """Serves get_object() for detail routes from the object cache.
+
+    The actions that save or delete the instance itself load it from
+    get_queryset() instead: saving writes every column, so a cached copy
+    would put back counters and versions changed since it was cached, in
+    this process or in another one whose invalidations never reach it.
+    """
+
+    uncached_actions = ("update", "partial_update", "destroy")
+
+    def get_object(self):
+        if self.action in self.uncached_actions:
+            return super().get_object()
+
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        instance = get_object(self.queryset, pk)
+        if instance is None:
+            raise Http404
+
+        self.check_object_permissions(self.request, instance)
+        return instance
@@ -18,6 +18,6 @@ class IsOwnerOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         try:
-            return obj.user == request.user
+            return obj.user_id == request.user.pk
         except AttributeError:
-            return obj.author == request.user.profile
+            return obj.author_id == request.user.profile.pk
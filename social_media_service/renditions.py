@@ -0,0 +1,118 @@
+"""Resized WebP and JPEG renditions of profile pictures and post media.
+
+Saving a Profile or Post whose image changed queues a job (see jobs.py) that
+makes every size in IMAGE_RENDITION_SIZES, so the upload request returns as
+soon as the original is stored. The job hands the resizing and encoding to
+a pool of IMAGE_RENDITION_WORKERS processes, so that the CPU-bound Pillow
+work does not hold the GIL the threads of the run_jobs worker share; with 0
+workers it renders in the job's thread.
+When the renditions are written their paths are stored on the row under the
+name of the original they were made from; until then (and for an image that
+has been replaced since) serializers expose no renditions and clients fall
+back to the original.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from . import jobs, object_cache
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+# Image field per model label; its renditions live in "<field>_renditions"
+IMAGE_FIELDS = {
+    "social_media_service.profile": "profile_picture",
+    "social_media_service.post": "media",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_dir(name):
+    """Returns the storage directory of the renditions of an original"""
+    return os.path.join("renditions", os.path.splitext(name)[0])
+
+
+def render(source, target_dir, sizes, quality):
+    """Writes every size of the image in every format; runs in a pool process.
+
+    Returns ``{size name: {format: file name in target_dir}}``.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    written = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        for name, size in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            written[name] = {}
+            for extension, image_format in FORMATS.items():
+                frame = resized if image_format == "WEBP" else resized.convert("RGB")
+                filename = f"{name}.{extension}"
+                frame.save(
+                    os.path.join(target_dir, filename),
+                    format=image_format,
+                    quality=quality,
+                )
+                written[name][extension] = filename
+    return written
+
+
+def _render_in_pool(*args):
+    global _executor
+
+    if not settings.IMAGE_RENDITION_WORKERS:
+        return render(*args)
+    # Jobs run on several threads of the worker, which share one pool
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_RENDITION_WORKERS
+            )
+    return _executor.submit(render, *args).result()
+
+
+@jobs.job()
+def make_renditions(label, pk, source):
+    """Renders the renditions of an original and stores their paths on the row"""
+    model = apps.get_model(label)
+    image_field = IMAGE_FIELDS[label]
+    directory = rendition_dir(source)
+    written = _render_in_pool(
+        default_storage.path(source),
+        default_storage.path(directory),
+        settings.IMAGE_RENDITION_SIZES,
+        settings.IMAGE_RENDITION_QUALITY,
+    )
+    renditions = {
+        name: {
+            extension: os.path.join(directory, filename)
+            for extension, filename in formats.items()
+        }
+        for name, formats in written.items()
+    }
+    # Skipped if the image was replaced while its renditions were made
+    model.objects.filter(pk=pk, **{image_field: source}).update(
+        **{f"{image_field}_renditions": {"source": source, **renditions}},
+        version=F("version") + 1,
+    )
+    object_cache.invalidate(model, pk)
+
+
+def schedule(instance):
+    """Queues the renditions of the instance's image if it has none yet"""
+    label = instance._meta.label_lower
+    source = getattr(instance, IMAGE_FIELDS[label]).name
+    made_from = getattr(instance, f"{IMAGE_FIELDS[label]}_renditions").get("source")
+    if source and made_from != source:
+        make_renditions.delay(label, instance.pk, source)
@@ -0,0 +1,155 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post, Profile
+
+# Models and the text column searched on each of them
+SEARCH_FIELDS = {
+    Post: "title",
+    Profile: "username",
+}
+
+# Trigram indexes cannot match fewer characters than this
+MIN_TRIGRAM_LENGTH = 3
+
+
+class SearchBackend:
+    """Substring search that scans the table, used when no index is available"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        """Creates the search indexes if they are missing"""
+
+    def search(self, queryset, term):
+        """Narrows the queryset to matching rows annotated with ``search_rank``"""
+        field = SEARCH_FIELDS[queryset.model]
+        return queryset.filter(**{f"{field}__icontains": term}).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 external-content tables with the trigram tokenizer, synced by triggers.
+
+    SQLite rebuilds tables on most schema changes, which drops their
+    triggers, so ``install`` is idempotent and runs after every migrate.
+    """
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            for model, field in SEARCH_FIELDS.items():
+                table = model._meta.db_table
+                fts = f"{table}_fts"
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{field}, content='{table}', content_rowid='id', "
+                    f"tokenize='trigram')"
+                )
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                    "AND tbl_name = %s AND name LIKE %s",
+                    [table, f"{fts}_%"],
+                )
+                if len(cursor.fetchall()) == 3:
+                    continue
+
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_ai")
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_ad")
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_au")
+                cursor.execute(
+                    f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); "
+                    f"END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {field}) "
+                    f"VALUES ('delete', old.id, old.{field}); "
+                    f"END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {field} ON {table} "
+                    f"BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {field}) "
+                    f"VALUES ('delete', old.id, old.{field}); "
+                    f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); "
+                    f"END"
+                )
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def search(self, queryset, term):
+        words = re.findall(r"\S+", term)
+        if any(len(word) < MIN_TRIGRAM_LENGTH for word in words):
+            return super().search(queryset, term)
+
+        table = queryset.model._meta.db_table
+        fts = f"{table}_fts"
+        query = " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+        # Joined rather than filtered by a subquery: the full-text index is
+        # then read once, and its bm25 rank can be compared in a page seek
+        return queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = "{table}"."id"', f"{fts} MATCH %s"],
+            params=[query],
+        ).annotate(search_rank=RawSQL(f"{fts}.rank", (), output_field=FloatField()))
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """GIN trigram indexes serving ILIKE, ranked by trigram similarity"""
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for model, field in SEARCH_FIELDS.items():
+                table = model._meta.db_table
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_{field}_trgm "
+                    f"ON {table} USING gin ({field} gin_trgm_ops)"
+                )
+
+    def search(self, queryset, term):
+        table = queryset.model._meta.db_table
+        field = SEARCH_FIELDS[queryset.model]
+        pattern = re.sub(r"([\\%_])", r"\\\1", term)
+        column = f'"{table}"."{field}"'
+        # ILIKE rather than icontains, whose UPPER() the trigram index cannot serve
+        return queryset.extra(
+            where=[f"{column} ILIKE %s"], params=[f"%{pattern}%"]
+        ).annotate(
+            search_rank=RawSQL(
+                f"-similarity({column}, %s)", (term,), output_field=FloatField()
+            )
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgreSQLSearchBackend,
+}
+
+
+def get_backend(using="default"):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def install_search_indexes(sender, using="default", **kwargs):
+    """post_migrate receiver that (re)creates the search indexes"""
+    get_backend(using).install()
+
+
+def search(queryset, term):
+    """Returns the queryset narrowed to rows matching the term, best matches first.
+
+    Results are annotated with ``search_rank``, lower being better, and
+    ordered by it and then by descending id. Every match can be paged
+    through: ``KeysetPagination`` seeks on the rank like on any column.
+    """
+    return (
+        get_backend(queryset.db).search(queryset, term).order_by("search_rank", "-id")
+    )
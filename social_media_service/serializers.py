@@ -1,22 +1,110 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import IntegrityError
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from .models import Profile, Post, Like, Follow, Comment
+from social_media_api.instrumentation import TimedSerializerMixin
+from . import uploads
+from .models import (
+    Profile,
+    Post,
+    Like,
+    Follow,
+    FollowSuggestion,
+    Comment,
+    UploadSession,
+)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+@extend_schema_field(OpenApiTypes.OBJECT)
+class RenditionsField(serializers.Field):
+    """URLs of the renditions of an image, keyed by size and format.
+
+    Empty until the renditions of the current image have been made.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        renditions = dict(getattr(instance, f"{self.image_field}_renditions"))
+        source = renditions.pop("source", None)
+        if not source or source != getattr(instance, self.image_field).name:
+            return {}
+
+        request = self.context.get("request")
+        urls = {}
+        for name, formats in renditions.items():
+            urls[name] = {}
+            for extension, path in formats.items():
+                url = default_storage.url(path)
+                urls[name][extension] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+        return urls
+
+
+@extend_schema_field(OpenApiTypes.UUID)
+class UploadField(serializers.PrimaryKeyRelatedField):
+    """A finalized upload session of the requesting user, given by id"""
+
+    def get_queryset(self):
+        profile = getattr(self.context["request"].user, "profile", None)
+        if profile is None:
+            return UploadSession.objects.none()
+        return UploadSession.objects.filter(profile_id=profile.pk, completed=True)
+
+
+class AttachUploadsMixin:
+    """Moves the uploads given in '<image field>_upload' into their image fields"""
+
+    upload_fields = ()
+
+    def attach_uploads(self, instance, validated_data):
+        pending = {
+            field_name: validated_data.pop(f"{field_name}_upload")
+            for field_name in self.upload_fields
+            if f"{field_name}_upload" in validated_data
+        }
+        for field_name, upload in pending.items():
+            target = instance or self.Meta.model(**validated_data)
+            validated_data[field_name] = uploads.claim(upload, target, field_name)
+
+    def create(self, validated_data):
+        self.attach_uploads(None, validated_data)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        self.attach_uploads(instance, validated_data)
+        return super().update(instance, validated_data)
+
+
+class ProfileSerializer(
+    TimedSerializerMixin, AttachUploadsMixin, serializers.ModelSerializer
+):
     email = serializers.EmailField(source="user.email", read_only=True)
+    profile_picture_renditions = RenditionsField("profile_picture")
+    profile_picture_upload = UploadField(write_only=True, required=False)
     username = serializers.CharField(
         validators=[UniqueValidator(queryset=Profile.objects.all())]
     )
 
+    upload_fields = ("profile_picture",)
+
     class Meta:
         model = Profile
         fields = (
             "id",
             "username",
             "profile_picture",
+            "profile_picture_renditions",
+            "profile_picture_upload",
             "first_name",
             "last_name",
             "bio",
@@ -24,6 +112,9 @@ class ProfileSerializer(serializers.ModelSerializer):
             "location",
             "email",
             "phone",
+            "followers_count",
+            "following_count",
+            "posts_count",
         )
 
     def create(self, validated_data):
@@ -33,7 +124,14 @@ class ProfileSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You already have a created profile.")
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(
+    TimedSerializerMixin, AttachUploadsMixin, serializers.ModelSerializer
+):
+    media_renditions = RenditionsField("media")
+    media_upload = UploadField(write_only=True, required=False)
+
+    upload_fields = ("media",)
+
     class Meta:
         model = Post
         fields = (
@@ -42,11 +140,15 @@ class PostSerializer(serializers.ModelSerializer):
             "author",
             "created_at",
             "media",
+            "media_renditions",
+            "media_upload",
             "content",
+            "likes_count",
+            "comments_count",
         )
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = serializers.CharField(source="author.username", read_only=True)
 
     class Meta:
@@ -54,7 +156,7 @@ class PostListSerializer(serializers.ModelSerializer):
         fields = ("title", "author")
 
 
-class LikeListSerializer(serializers.ModelSerializer):
+class LikeListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile = serializers.CharField(source="profile.username", read_only=True)
     post = serializers.CharField(source="post.title", read_only=True)
 
@@ -63,16 +165,54 @@ class LikeListSerializer(serializers.ModelSerializer):
         fields = ("profile", "post")
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile = serializers.CharField(source="profile.username", read_only=True)
     post = serializers.CharField(source="post.title", read_only=True)
+    parent = serializers.PrimaryKeyRelatedField(
+        queryset=Comment.objects.select_related("parent"),
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         model = Comment
-        fields = ("id", "post", "profile", "text", "created_at")
+        fields = (
+            "id",
+            "post",
+            "profile",
+            "parent",
+            "text",
+            "created_at",
+            "replies_count",
+        )
+
+    def validate_parent(self, parent):
+        """Checks the comment replied to is on the same post, within its thread"""
+        if self.instance is not None:
+            if parent != self.instance.parent:
+                raise serializers.ValidationError("A comment cannot change threads.")
+            return parent
 
+        if parent is not None:
+            if parent.post_id != self.context["post"].pk:
+                raise serializers.ValidationError(
+                    "The comment replied to is on another post."
+                )
+            # Replies to a reply join the thread of its top-level comment
+            parent = parent.parent or parent
+        return parent
 
-class FollowerListSerializer(serializers.ModelSerializer):
+
+class CommentThreadSerializer(CommentSerializer):
+    """A top-level comment with its first replies, see threads.py"""
+
+    replies = CommentSerializer(source="preview", many=True, read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ("replies",)
+
+
+class FollowerListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     follower = serializers.CharField(source="follower.username", read_only=True)
 
     class Meta:
@@ -80,9 +220,57 @@ class FollowerListSerializer(serializers.ModelSerializer):
         fields = ("follower",)
 
 
-class FollowingListSerializer(serializers.ModelSerializer):
+class FollowingListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     following = serializers.CharField(source="following.username", read_only=True)
 
     class Meta:
         model = Follow
         fields = ("following",)
+
+
+class FollowSuggestionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source="suggested_id", read_only=True)  # noqa: VNE003
+    username = serializers.CharField(source="suggested.username", read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ("id", "username", "score")
+
+
+class FollowStatusSerializer(serializers.Serializer):
+    following = serializers.BooleanField()
+    followed_by = serializers.BooleanField()
+
+
+class ProfileRefSerializer(serializers.Serializer):
+    id = serializers.IntegerField()  # noqa: VNE003
+    username = serializers.CharField()
+
+
+class ProfileSampleSerializer(TimedSerializerMixin, serializers.Serializer):
+    count = serializers.IntegerField()
+    results = ProfileRefSerializer(many=True)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS,
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
+class BulkResultSerializer(TimedSerializerMixin, serializers.Serializer):
+    id = serializers.IntegerField()  # noqa: VNE003
+    status = serializers.CharField()
+
+
+class UploadSessionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1, max_value=settings.UPLOAD_MAX_SIZE)
+
+    class Meta:
+        model = UploadSession
+        fields = ("id", "filename", "size", "received", "completed", "created_at")
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import graph_index, object_cache, renditions, suggestions, timeline
+from .models import Post, Profile
+
+# Sent with ``follower_id`` and ``following_ids`` once follows are written or removed
+follows_created = Signal()
+follows_deleted = Signal()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(follows_created)
+def backfill_timeline(sender, follower_id, following_ids, **kwargs):
+    timeline.backfill(follower_id, following_ids)
+
+
+@receiver(follows_deleted)
+def evict_timeline(sender, follower_id, following_ids, **kwargs):
+    timeline.evict(follower_id, following_ids)
+
+
+@receiver(follows_created)
+def index_follows(sender, follower_id, following_ids, **kwargs):
+    graph_index.record(follower_id, following_ids, followed=True)
+
+
+@receiver(follows_deleted)
+def unindex_follows(sender, follower_id, following_ids, **kwargs):
+    graph_index.record(follower_id, following_ids, followed=False)
+
+
+@receiver(follows_created)
+@receiver(follows_deleted)
+def refresh_suggestions(sender, follower_id, following_ids, **kwargs):
+    suggestions.refresh.delay(follower_id, sorted(following_ids))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_object(sender, instance, **kwargs):
+    object_cache.invalidate(sender, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def schedule_renditions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        renditions.schedule(instance)
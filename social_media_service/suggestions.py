@@ -0,0 +1,149 @@
+"""Follow suggestions: the profiles followed by the profiles one follows.
+
+A FollowSuggestion row holds a profile that ``profile`` does not follow,
+with the number of its followees who do as ``score``. ``manage.py
+compute_suggestions`` rebuilds the rows of every profile in batches with
+vectorized NumPy operations over the follow graph in CSR form (see
+``two_hop``), keeping the best SUGGESTIONS_PER_PROFILE of each.
+
+Follows and unfollows then queue ``refresh``, which recounts the scores
+they change: those of the profile that (un)followed, and the score of each
+(un)followed profile for every follower of that profile, who gained or
+lost a path through it. Profiles that gained a suggestion that way are
+trimmed back to their best SUGGESTIONS_PER_PROFILE; a suggestion trimmed
+off comes back with the next full rebuild. Reading suggestions is a range
+scan of suggestion_profile_rank_idx.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+from . import jobs
+from .graph_index import FollowGraph
+from .models import Follow, FollowSuggestion
+
+
+def follow_graph():
+    """Returns the sorted profile ids and the follow graph between their positions.
+
+    The graph is in CSR form: the positions of the profiles followed from
+    position ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, in order.
+    """
+    graph = FollowGraph.from_database()
+    return graph.ids, graph.out_indptr, graph.out_indices
+
+
+def two_hop(indptr, indices, start, stop, limit):
+    """Ranks the two-hop follows of the positions in ``range(start, stop)``.
+
+    Returns the arrays ``(sources, targets, scores)`` of the ``limit`` best
+    targets per source, which it does not follow yet, ordered by source,
+    then by descending score, then by target.
+    """
+    degree = np.diff(indptr)
+    size = len(degree)
+    sources = np.repeat(np.arange(start, stop), degree[start:stop])
+    first, last = indptr[start], indptr[stop]
+    middles = indices[first:last]
+
+    # Each follow of a source continues to every profile its middle follows
+    lengths = degree[middles]
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    targets = indices[np.repeat(indptr[middles], lengths) + offsets]
+    origins = np.repeat(sources, lengths)
+
+    keys = origins * size + targets
+    keys, scores = np.unique(keys[origins != targets], return_counts=True)
+    new = ~np.isin(keys, sources * size + middles)
+    origins, targets = np.divmod(keys[new], size)
+    scores = scores[new]
+
+    order = np.lexsort((targets, -scores, origins))
+    origins, targets, scores = origins[order], targets[order], scores[order]
+    ranks = np.arange(len(origins)) - np.searchsorted(origins, origins)
+    best = ranks < limit
+    return origins[best], targets[best], scores[best]
+
+
+def _recompute(profile_id):
+    """Replaces the suggestions of a profile with its current best ones"""
+    followees = Follow.objects.filter(follower_id=profile_id).values("following_id")
+    ranked = (
+        Follow.objects.filter(follower_id__in=followees)
+        .exclude(following_id=profile_id)
+        .exclude(following_id__in=followees)
+        .values("following_id")
+        .annotate(score=Count("*"))
+        .order_by("-score", "following_id")[: settings.SUGGESTIONS_PER_PROFILE]
+    )
+    FollowSuggestion.objects.filter(profile_id=profile_id).delete()
+    FollowSuggestion.objects.bulk_create(
+        FollowSuggestion(
+            profile_id=profile_id, suggested_id=row["following_id"], score=row["score"]
+        )
+        for row in ranked
+    )
+
+
+def _recount(profile_ids, suggested_id):
+    """Recounts how many followees of each of the profiles follow a profile"""
+    its_followers = Follow.objects.filter(following_id=suggested_id).values(
+        "follower_id"
+    )
+    scores = (
+        Follow.objects.filter(
+            follower_id__in=profile_ids, following_id__in=its_followers
+        )
+        .exclude(follower_id=suggested_id)
+        .exclude(follower_id__in=its_followers)
+        .values("follower_id")
+        .annotate(score=Count("*"))
+    )
+    FollowSuggestion.objects.filter(
+        profile_id__in=profile_ids, suggested_id=suggested_id
+    ).delete()
+    created = FollowSuggestion.objects.bulk_create(
+        FollowSuggestion(
+            profile_id=row["follower_id"], suggested_id=suggested_id, score=row["score"]
+        )
+        for row in scores
+    )
+    _trim([suggestion.profile_id for suggestion in created])
+
+
+def _trim(profile_ids):
+    """Deletes the suggestions of the profiles that rank below their best ones"""
+    if not profile_ids:
+        return
+    limit = settings.SUGGESTIONS_PER_PROFILE
+    last = limit - 1
+    # The last suggestion each profile keeps, NULL when it has no more
+    cutoff = FollowSuggestion.objects.filter(profile_id=OuterRef("profile_id"))
+    cutoff = cutoff.order_by("-score", "suggested_id")[last:limit]
+    beyond = (
+        FollowSuggestion.objects.filter(profile_id__in=profile_ids)
+        .annotate(
+            cutoff_score=Subquery(cutoff.values("score")),
+            cutoff_id=Subquery(cutoff.values("suggested_id")),
+        )
+        .filter(
+            Q(score__lt=F("cutoff_score"))
+            | Q(score=F("cutoff_score"), suggested_id__gt=F("cutoff_id"))
+        )
+    )
+    FollowSuggestion.objects.filter(
+        pk__in=list(beyond.values_list("pk", flat=True))
+    ).delete()
+
+
+@jobs.job()
+def refresh(follower_id, following_ids):
+    """Updates the suggestions that changed when a profile (un)followed others"""
+    followers = Follow.objects.filter(following_id=follower_id).values("follower_id")
+    with transaction.atomic():
+        _recompute(follower_id)
+        for following_id in following_ids:
+            _recount(followers, following_id)
@@ -0,0 +1,328 @@
+"""Query-budget and latency benchmarks for every router action.
+
+Each endpoint is measured against a small and a large dataset, both
+several pages long: the number of SQL queries must not grow with the result
+size and must stay within the budget recorded in benchmark_baseline.json.
+The p95 latency of read endpoints must not regress past the recorded p95
+times a tolerance; wall-clock times depend on the machine, so that check
+only runs when asked for.
+
+Run only these with ``python manage.py test --tag benchmark`` (or skip them
+with ``--exclude-tag benchmark``). Environment variables:
+
+- BENCHMARK_LATENCY=1 runs the latency check
+- BENCHMARK_UPDATE_BASELINE=1 rewrites the baseline with the measured values,
+  latency included
+- BENCHMARK_LATENCY_TOLERANCE multiplies the recorded p95 (default 3)
+- BENCHMARK_LATENCY_SLACK_MS is added on top of it (default 10)
+- BENCHMARK_REPORT=<path> writes the measured numbers as JSON
+"""
+import json
+import os
+from pathlib import Path
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social_media_service import graph_index, timeline
+from social_media_service.benchmarking import measure, summarize
+from social_media_service.models import (
+    Comment,
+    Follow,
+    FollowSuggestion,
+    Like,
+    Post,
+    Profile,
+)
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+UPDATE_BASELINE = os.environ.get("BENCHMARK_UPDATE_BASELINE") == "1"
+MEASURE_LATENCY = UPDATE_BASELINE or os.environ.get("BENCHMARK_LATENCY") == "1"
+LATENCY_TOLERANCE = float(os.environ.get("BENCHMARK_LATENCY_TOLERANCE", "3"))
+LATENCY_SLACK_MS = float(os.environ.get("BENCHMARK_LATENCY_SLACK_MS", "10"))
+REPORT_PATH = os.environ.get("BENCHMARK_REPORT")
+
+SMALL_SIZE = api_settings.PAGE_SIZE * 2 + 5
+LARGE_SIZE = api_settings.PAGE_SIZE * 10
+ITERATIONS = 25
+
+
+class BenchmarkData:
+    """Seeds a viewer surrounded by ``size`` profiles that interact with it"""
+
+    def __init__(self):
+        self.viewer = Profile.objects.create(
+            user=get_user_model().objects.create_user("viewer@bench.com"),
+            username="bench_viewer",
+        )
+        self.post = Post.objects.create(
+            author=self.viewer, title="bench target", content="content"
+        )
+        self.size = 0
+
+    def grow(self, size):
+        start, self.size = self.size, size
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"bench{index}@bench.com")
+            for index in range(start, size)
+        )
+        profiles = Profile.objects.bulk_create(
+            Profile(user=user, username=f"bench_user_{index}")
+            for index, user in enumerate(users, start)
+        )
+        posts = Post.objects.bulk_create(
+            Post(author=profile, title=f"bench post {index}", content="content")
+            for index, profile in enumerate(profiles, start)
+        )
+        Post.objects.bulk_create(
+            Post(author=self.viewer, title=f"bench own post {index}", content="")
+            for index in range(start, size)
+        )
+        Follow.objects.bulk_create(
+            [Follow(follower=self.viewer, following=profile) for profile in profiles]
+            + [Follow(follower=profile, following=self.viewer) for profile in profiles]
+        )
+        Like.objects.bulk_create(Like(profile=self.viewer, post=post) for post in posts)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, profile=profile, text="comment")
+            for profile in profiles
+        )
+        # The newest thread, so that the first page of comments previews it
+        self.thread = Comment.objects.create(
+            post=self.post, profile=self.viewer, text="thread"
+        )
+        Comment.objects.bulk_create(
+            Comment(post=self.post, profile=profile, parent=self.thread, text="reply")
+            for profile in profiles
+        )
+        Comment.objects.filter(pk=self.thread.pk).update(replies_count=len(profiles))
+        FollowSuggestion.objects.bulk_create(
+            FollowSuggestion(profile=self.viewer, suggested=profile, score=1)
+            for profile in profiles
+        )
+        timeline.backfill(self.viewer.pk, [profile.pk for profile in profiles])
+        self.other, *self.others = profiles[:4]
+        self.liked = [post.pk for post in posts[:3]]
+        self.comment = Comment.objects.create(
+            post=self.post, profile=self.viewer, parent=self.thread, text="own reply"
+        )
+
+
+def read_endpoints(data):
+    viewer, post, other = data.viewer.pk, data.post.pk, data.other.pk
+    return {
+        "profile-list": reverse("social_media_service:profile-list"),
+        "profile-search": reverse("social_media_service:profile-list")
+        + "?username=bench_user",
+        "profile-detail": reverse("social_media_service:profile-detail", args=[viewer]),
+        "profile-followers": reverse(
+            "social_media_service:profile-followers", args=[viewer]
+        ),
+        "profile-following": reverse(
+            "social_media_service:profile-following", args=[viewer]
+        ),
+        "profile-posts": reverse("social_media_service:profile-posts", args=[viewer]),
+        "profile-following-posts": reverse(
+            "social_media_service:profile-following-posts", args=[viewer]
+        ),
+        "profile-liked-posts": reverse(
+            "social_media_service:profile-liked-posts", args=[viewer]
+        ),
+        "profile-is-following": reverse(
+            "social_media_service:profile-is-following", args=[viewer]
+        )
+        + f"?profile={other}",
+        "profile-mutuals": reverse(
+            "social_media_service:profile-mutuals", args=[viewer]
+        )
+        + f"?profile={other}",
+        "profile-followed-by-friends": reverse(
+            "social_media_service:profile-followed-by-friends", args=[viewer]
+        ),
+        "profile-suggestions": reverse(
+            "social_media_service:profile-suggestions", args=[viewer]
+        ),
+        "post-list": reverse("social_media_service:post-list"),
+        "post-search": reverse("social_media_service:post-list") + "?title=bench",
+        "post-trending": reverse("social_media_service:post-trending"),
+        "post-detail": reverse("social_media_service:post-detail", args=[post]),
+        "post-comments": reverse("social_media_service:post-comments", args=[post]),
+        "post-replies": reverse(
+            "social_media_service:post-replies", args=[post, data.thread.pk]
+        ),
+    }
+
+
+def write_endpoints(data):
+    """Write requests, ordered so that each one succeeds on the seeded data"""
+    post, other, comment = data.post.pk, data.other.pk, data.comment.pk
+    others = {"ids": [profile.pk for profile in data.others]}
+    liked = {"ids": data.liked}
+    text = {"text": "bench"}
+    return {
+        "post-like": (
+            "post",
+            reverse("social_media_service:post-like", args=[post]),
+            None,
+        ),
+        "post-unlike": (
+            "post",
+            reverse("social_media_service:post-unlike", args=[post]),
+            None,
+        ),
+        "profile-unfollow": (
+            "post",
+            reverse("social_media_service:profile-unfollow", args=[other]),
+            None,
+        ),
+        "profile-follow": (
+            "post",
+            reverse("social_media_service:profile-follow", args=[other]),
+            None,
+        ),
+        "profile-bulk-unfollow": (
+            "post",
+            reverse("social_media_service:profile-bulk-unfollow"),
+            others,
+        ),
+        "profile-bulk-follow": (
+            "post",
+            reverse("social_media_service:profile-bulk-follow"),
+            others,
+        ),
+        "post-bulk-unlike": (
+            "post",
+            reverse("social_media_service:post-bulk-unlike"),
+            liked,
+        ),
+        "post-bulk-like": (
+            "post",
+            reverse("social_media_service:post-bulk-like"),
+            liked,
+        ),
+        "post-add-comment": (
+            "post",
+            reverse("social_media_service:post-add-comment", args=[post]),
+            text,
+        ),
+        "post-update-comment": (
+            "put",
+            reverse("social_media_service:post-update-comment", args=[post, comment]),
+            text,
+        ),
+        "post-delete-comment": (
+            "delete",
+            reverse("social_media_service:post-delete-comment", args=[post, comment]),
+            None,
+        ),
+    }
+
+
+@tag("benchmark")
+@override_settings(FOLLOW_GRAPH_LOAD_IN_BACKGROUND=False)
+class EndpointBenchmarkTest(TestCase):
+    measured = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.baseline = (
+            json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if UPDATE_BASELINE:
+            BASELINE_PATH.write_text(
+                json.dumps(cls.measured, indent=2, sort_keys=True) + "\n"
+            )
+        if REPORT_PATH:
+            Path(REPORT_PATH).write_text(json.dumps(cls.measured, indent=2))
+
+    def setUp(self):
+        cache.clear()
+        graph_index.reset()
+        self.addCleanup(graph_index.reset)
+        self.data = BenchmarkData()
+        self.client = APIClient()
+        token = AccessToken.for_user(self.data.viewer.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        # Resolve the viewer once so that every measured request sees a warm cache
+        self.client.get(reverse("user:manage"))
+
+    def record(self, name, **values):
+        self.measured.setdefault(name, {}).update(values)
+
+    def budget(self, name, key):
+        if UPDATE_BASELINE:
+            return None
+        try:
+            return self.baseline[name][key]
+        except KeyError:
+            self.fail(
+                f"No {key} recorded for {name}; "
+                f"rerun with BENCHMARK_UPDATE_BASELINE=1."
+            )
+
+    def count_queries(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 400, url)
+        return len(queries)
+
+    def count_all_queries(self):
+        """Counts the queries of every endpoint on the data seeded so far"""
+        # Loaded up front, as it is once per process, and with the new rows
+        graph_index.reset()
+        graph_index.get_graph()
+        reads = {
+            name: ("get", url, None) for name, url in read_endpoints(self.data).items()
+        }
+        endpoints = {**reads, **write_endpoints(self.data)}
+        return {
+            name: self.count_queries(*request) for name, request in endpoints.items()
+        }
+
+    def test_query_budget_is_constant_in_result_size(self):
+        self.data.grow(SMALL_SIZE)
+        small = self.count_all_queries()
+        self.data.grow(LARGE_SIZE)
+        large = self.count_all_queries()
+
+        for name in large:
+            with self.subTest(endpoint=name):
+                self.assertEqual(small[name], large[name], "query count grows")
+                self.record(name, queries=large[name])
+                budget = self.budget(name, "queries")
+                if budget is not None:
+                    self.assertLessEqual(large[name], budget)
+
+    @skipUnless(MEASURE_LATENCY, "set BENCHMARK_LATENCY=1 to check latency")
+    def test_read_latency_does_not_regress(self):
+        self.data.grow(LARGE_SIZE)
+        graph_index.get_graph()
+
+        for name, url in read_endpoints(self.data).items():
+            with self.subTest(endpoint=name):
+                self.client.get(url)
+                stats = summarize(measure(lambda: self.client.get(url), ITERATIONS))
+                self.record(
+                    name,
+                    p50_ms=round(stats["p50_ms"], 2),
+                    p95_ms=round(stats["p95_ms"], 2),
+                )
+                budget = self.budget(name, "p95_ms")
+                if budget is not None:
+                    self.assertLessEqual(
+                        stats["p95_ms"],
+                        budget * LATENCY_TOLERANCE + LATENCY_SLACK_MS,
+                    )
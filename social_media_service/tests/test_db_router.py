@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from social_media_api.db_router import PrimaryPinningMiddleware
+from social_media_service.models import Post
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], DATABASE_PIN_SECONDS=60)
+class PrimaryReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("router@test.com", "pass")
+        self.other = get_user_model().objects.create_user("other@test.com", "pass")
+        self.factory = RequestFactory()
+
+    def route(self, method, user, write=False):
+        """Returns the alias reads go to in a request, after its user is known"""
+        aliases = {}
+
+        def view(request):
+            request.user = user
+            aliases["before"] = router.db_for_read(Post)
+            if write:
+                router.db_for_write(Post)
+            aliases["after"] = router.db_for_read(Post)
+            return HttpResponse()
+
+        request = getattr(self.factory, method)("/")
+        PrimaryPinningMiddleware(view)(request)
+        return aliases
+
+    def test_reads_of_safe_requests_go_to_a_replica(self):
+        self.assertEqual(self.route("get", self.user)["after"], "replica1")
+
+    def test_other_requests_read_from_the_primary(self):
+        self.assertEqual(self.route("post", self.user)["after"], "default")
+
+    def test_unknown_users_read_from_the_primary(self):
+        self.assertEqual(self.route("get", AnonymousUser())["after"], "default")
+
+        request = self.factory.get("/")
+        aliases = []
+        PrimaryPinningMiddleware(
+            lambda request: aliases.append(router.db_for_read(Post)) or HttpResponse()
+        )(request)
+        self.assertEqual(aliases, ["default"])
+
+    def test_reads_outside_requests_go_to_the_primary(self):
+        self.assertEqual(router.db_for_read(Post), "default")
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        aliases = self.route("get", self.user, write=True)
+        self.assertEqual(aliases, {"before": "replica1", "after": "default"})
+
+        self.assertEqual(self.route("get", self.user)["after"], "default")
+        self.assertEqual(self.route("get", self.other)["after"], "replica1")
+
+        cache.clear()
+        self.assertEqual(self.route("get", self.user)["after"], "replica1")
+
+    def test_writes_always_go_to_the_primary(self):
+        self.assertEqual(router.db_for_write(Post), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_middleware_is_off_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PrimaryPinningMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,229 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from social_media_service import graph_index
+from social_media_service.graph_index import FollowGraph
+from social_media_service.models import Follow, Profile
+
+
+def create_profiles(count, prefix="graph"):
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"{prefix}-{index}@test.com") for index in range(count)
+    )
+    return Profile.objects.bulk_create(
+        Profile(user=user, username=f"{prefix}_{index}")
+        for index, user in enumerate(users)
+    )
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        self.profiles = create_profiles(30)
+        rng = random.Random(3)
+        Follow.objects.bulk_create(
+            Follow(follower=follower, following=following)
+            for follower in self.profiles
+            for following in rng.sample(self.profiles, 5)
+            if follower != following
+        )
+
+    def assert_matches_database(self, graph):
+        pairs = set(Follow.objects.values_list("follower_id", "following_id"))
+        for profile in self.profiles:
+            following = sorted(b for a, b in pairs if a == profile.pk)
+            followers = sorted(a for a, b in pairs if b == profile.pk)
+            self.assertEqual(graph.following(profile.pk).tolist(), following)
+            self.assertEqual(graph.followers(profile.pk).tolist(), followers)
+            for other in self.profiles:
+                self.assertEqual(
+                    graph.follows(profile.pk, other.pk),
+                    (profile.pk, other.pk) in pairs,
+                )
+
+    def test_index_matches_the_follow_table(self):
+        graph = FollowGraph.from_database()
+        self.assert_matches_database(graph)
+        self.assertFalse(graph.follows(self.profiles[0].pk, 10**9))
+
+    def test_deltas_are_applied_on_top_of_the_arrays(self):
+        graph = FollowGraph.from_database()
+        first, second = self.profiles[:2]
+        (newcomer,) = create_profiles(1, prefix="newcomer")
+        unfollowed = graph.following(first.pk).tolist()
+        Follow.objects.filter(follower=first).delete()
+        Follow.objects.insert_ignore(follower=second, following=first)
+        Follow.objects.create(follower=newcomer, following=second)
+
+        graph.apply(first.pk, unfollowed, followed=False)
+        graph.apply(second.pk, [first.pk], followed=True)
+        graph.apply(newcomer.pk, [second.pk], followed=True)
+
+        self.profiles.append(newcomer)
+        self.assert_matches_database(graph)
+
+    def test_snapshot_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npy")
+            call_command("snapshot_follow_graph", path=path, stdout=StringIO())
+
+            with override_settings(FOLLOW_GRAPH_SNAPSHOT=path):
+                graph = graph_index.load()
+            self.assertIsNotNone(graph.data.filename)
+            self.assert_matches_database(graph)
+            del graph
+
+    def test_reload_keeps_the_follows_of_this_process(self):
+        first, second = self.profiles[:2]
+        Follow.objects.filter(follower=first, following=second).delete()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npy")
+            old = FollowGraph.from_database()
+            old.loaded_at -= 10
+            old.save(path)
+            current = FollowGraph.from_database()
+            snapshot = FollowGraph.from_database()
+            snapshot.loaded_at += 10
+
+            Follow.objects.create(follower=first, following=second)
+            current.apply(first.pk, [second.pk], followed=True, at=time.time() + 20)
+
+            with override_settings(FOLLOW_GRAPH_SNAPSHOT=path):
+                # Older than the index it would replace
+                graph = graph_index.load(current)
+                self.assertNotIsInstance(graph.data, np.memmap)
+                self.assert_matches_database(graph)
+
+                snapshot.save(path)
+                graph = graph_index.load(current)
+                self.assertIsInstance(graph.data, np.memmap)
+                self.assert_matches_database(graph)
+            del graph
+
+
+@override_settings(FOLLOW_GRAPH_LOAD_IN_BACKGROUND=False)
+class GraphActionsTests(TestCase):
+    def setUp(self):
+        graph_index.reset()
+        self.me, self.friend, self.star, self.fan = create_profiles(4)
+        for follower, following in [
+            (self.me, self.friend),
+            (self.friend, self.star),
+            (self.fan, self.star),
+            (self.fan, self.me),
+        ]:
+            Follow.objects.create(follower=follower, following=following)
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def tearDown(self):
+        graph_index.reset()
+
+    def get(self, name, target, **params):
+        url = reverse(f"social_media_service:profile-{name}", args=[target.pk])
+        return self.client.get(url, params)
+
+    def usernames(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["username"] for row in response.data["results"]]
+
+    def check_answers(self):
+        res = self.get("is-following", self.fan, profile=self.me.pk)
+        self.assertEqual(res.data, {"following": True, "followed_by": False})
+
+        res = self.get("mutuals", self.star, profile=self.me.pk)
+        self.assertEqual(self.usernames(res), ["graph_3"])
+        self.assertEqual(res.data["count"], 1)
+
+        res = self.get("followed-by-friends", self.star)
+        self.assertEqual(self.usernames(res), ["graph_1"])
+
+    def test_actions_answer_from_the_index(self):
+        self.check_answers()
+        with self.assertNumQueries(0):
+            self.assertTrue(graph_index.follows(self.fan.pk, self.me.pk))
+
+    @override_settings(FOLLOW_GRAPH_INDEX=False)
+    def test_actions_answer_from_the_database_without_the_index(self):
+        self.check_answers()
+        self.assertIsNone(graph_index._graph)
+
+    def test_follows_of_this_process_update_the_index(self):
+        self.check_answers()
+
+        url = reverse("social_media_service:profile-follow", args=[self.star.pk])
+        self.client.post(url)
+        res = self.get("is-following", self.me, profile=self.star.pk)
+        self.assertEqual(res.data, {"following": True, "followed_by": False})
+
+        url = reverse("social_media_service:profile-unfollow", args=[self.friend.pk])
+        self.client.post(url)
+        res = self.get("followed-by-friends", self.star)
+        self.assertEqual(self.usernames(res), [])
+
+    def test_profile_parameter_is_validated(self):
+        res = self.get("mutuals", self.star)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("profile", res.data)
+
+        res = self.get("is-following", self.star, profile="me")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BackgroundLoadTests(TransactionTestCase):
+    def setUp(self):
+        graph_index.reset()
+        self.addCleanup(graph_index.reset)
+        self.first, self.second = create_profiles(2)
+        Follow.objects.create(follower=self.first, following=self.second)
+
+        # Loads wait until the test lets them through
+        self.release = threading.Event()
+        load = graph_index.load
+
+        def held_load(current=None):
+            self.release.wait()
+            return load(current)
+
+        patcher = mock.patch.object(graph_index, "load", held_load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def finish_load(self):
+        loader = graph_index._loader
+        self.release.set()
+        loader.join()
+        self.release.clear()
+
+    def test_requests_do_not_wait_for_the_index(self):
+        self.assertIsNone(graph_index.get_graph())
+        with self.assertNumQueries(1):
+            self.assertTrue(graph_index.follows(self.first.pk, self.second.pk))
+        self.finish_load()
+        graph = graph_index.get_graph()
+        self.assertIsNotNone(graph)
+
+        graph.loaded_at -= settings.FOLLOW_GRAPH_MAX_AGE + 1
+        self.assertIs(graph_index.get_graph(), graph)
+        Follow.objects.create(follower=self.second, following=self.first)
+        # Recorded on the old index while the new one loads
+        graph_index.record(self.second.pk, [self.first.pk], followed=True)
+        self.assertIs(graph_index.get_graph(), graph)
+        self.finish_load()
+
+        reloaded = graph_index.get_graph()
+        self.assertIsNot(reloaded, graph)
+        self.assertTrue(reloaded.follows(self.second.pk, self.first.pk))
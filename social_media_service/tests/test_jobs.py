@@ -0,0 +1,82 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from social_media_service import jobs
+from social_media_service.models import Job
+
+CALLS = []
+
+
+@jobs.job()
+def record(value, fail=False):
+    CALLS.append(value)
+    if fail:
+        raise ValueError(value)
+
+
+@override_settings(JOB_RETRY_DELAY=0)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_jobs_are_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.delay("first")
+            self.assertFalse(Job.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(CALLS, ["first"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_job_is_not_claimed_again(self):
+        Job.objects.create(name="social_media_service.tests.test_jobs.record")
+        self.assertEqual(len(jobs.claim("first")), 1)
+        self.assertEqual(jobs.claim("second"), [])
+
+    def test_failed_job_is_retried_until_max_attempts(self):
+        job = Job.objects.create(
+            name="social_media_service.tests.test_jobs.record",
+            args=["broken"],
+            kwargs={"fail": True},
+            max_attempts=2,
+        )
+
+        self.assertEqual(jobs.run_pending(), 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn("ValueError", job.last_error)
+        self.assertEqual(CALLS, ["broken", "broken"])
+
+    def test_jobs_of_dead_workers_are_requeued(self):
+        job = Job.objects.create(
+            name="social_media_service.tests.test_jobs.record",
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(days=1),
+        )
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_run_jobs_command(self):
+        for value in range(3):
+            Job.objects.create(
+                name="social_media_service.tests.test_jobs.record", args=[value]
+            )
+
+        # One job at a time: the in-memory test database allows a single writer
+        call_command("run_jobs", once=True, concurrency=1, stdout=StringIO())
+
+        self.assertEqual(sorted(CALLS), [0, 1, 2])
+        self.assertFalse(Job.objects.exists())
@@ -4,6 +4,12 @@ from django.utils import timezone
 from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory
 
+from social_media_service.fast_serializers import (
+    FastFollowerListSerializer,
+    FastFollowingListSerializer,
+    FastLikeListSerializer,
+    FastPostListSerializer,
+)
 from social_media_service.models import Post, Comment, Profile, Like, Follow
 from social_media_service.serializers import (
     PostSerializer,
@@ -192,9 +198,47 @@ class CommentSerializerTest(TestCase):
             "id": comment.id,
             "post": self.post.title,
             "profile": self.profile.username,
+            "parent": None,
             "text": "This is a test comment",
             "created_at": comment.created_at.strftime(
                 "%Y-%m-%dT%H:%M:%S.%fZ"
             ),  # Include the actual created_at value
+            "replies_count": 0,
         }
         self.assertEqual(serializer.data, expected_data)
+
+
+class FastSerializersTest(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.create(
+            user=User.objects.create_user(email="fast@example.com"),
+            username="fast_user",
+        )
+        self.other = Profile.objects.create(
+            user=User.objects.create_user(email="other@example.com"),
+            username="other_user",
+        )
+        self.post = Post.objects.create(
+            title="Fast Post", content="content", author=self.other
+        )
+        Like.objects.create(profile=self.profile, post=self.post)
+        Follow.objects.create(follower=self.profile, following=self.other)
+
+    def assert_same_output(self, serializer_class, fast_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = fast_class(fast_class.rows_for(queryset)).data
+        self.assertEqual(actual, expected)
+
+    def test_fast_serializers_match_model_serializers(self):
+        self.assert_same_output(
+            PostListSerializer, FastPostListSerializer, Post.objects.all()
+        )
+        self.assert_same_output(
+            LikeListSerializer, FastLikeListSerializer, Like.objects.all()
+        )
+        self.assert_same_output(
+            FollowerListSerializer, FastFollowerListSerializer, Follow.objects.all()
+        )
+        self.assert_same_output(
+            FollowingListSerializer, FastFollowingListSerializer, Follow.objects.all()
+        )
@@ -0,0 +1,165 @@
+import random
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from social_media_service import jobs
+from social_media_service.models import Follow, FollowSuggestion, Profile
+from social_media_service.suggestions import follow_graph, two_hop
+
+
+def create_profiles(count, prefix="suggest"):
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"{prefix}-{index}@test.com") for index in range(count)
+    )
+    return Profile.objects.bulk_create(
+        Profile(user=user, username=f"{prefix}_{index}")
+        for index, user in enumerate(users)
+    )
+
+
+def expected_suggestions(limit):
+    """Counts the two-hop follows of every profile the slow way"""
+    following = {}
+    for follower_id, following_id in Follow.objects.values_list(
+        "follower_id", "following_id"
+    ):
+        following.setdefault(follower_id, set()).add(following_id)
+
+    expected = {}
+    for profile_id, followees in following.items():
+        scores = Counter(
+            target
+            for middle in followees
+            for target in following.get(middle, ())
+            if target != profile_id and target not in followees
+        )
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if ranked:
+            expected[profile_id] = ranked[:limit]
+    return expected
+
+
+def stored_suggestions():
+    stored = {}
+    for row in FollowSuggestion.objects.order_by("profile_id", "-score", "suggested"):
+        stored.setdefault(row.profile_id, []).append((row.suggested_id, row.score))
+    return stored
+
+
+class TwoHopTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d, self.e = create_profiles(5)
+        for follower, following in [
+            (self.a, self.b),
+            (self.a, self.c),
+            (self.b, self.c),
+            (self.b, self.d),
+            (self.b, self.e),
+            (self.c, self.d),
+            (self.c, self.a),
+        ]:
+            Follow.objects.create(follower=follower, following=following)
+
+    def test_ranks_unfollowed_two_hop_profiles_by_overlap(self):
+        ids, indptr, indices = follow_graph()
+        sources, targets, scores = two_hop(indptr, indices, 0, len(ids), limit=10)
+
+        ranked = [
+            (ids[source], ids[target], score)
+            for source, target, score in zip(sources, targets, scores)
+            if ids[source] == self.a.pk
+        ]
+        self.assertEqual(ranked, [(self.a.pk, self.d.pk, 2), (self.a.pk, self.e.pk, 1)])
+
+    def test_limit_keeps_the_best_of_each_profile(self):
+        ids, indptr, indices = follow_graph()
+        position = ids.tolist().index(self.a.pk)
+        sources, targets, _ = two_hop(indptr, indices, position, position + 1, limit=1)
+        self.assertEqual(sources.tolist(), [position])
+        self.assertEqual(ids[targets].tolist(), [self.d.pk])
+
+
+class ComputeSuggestionsCommandTests(TestCase):
+    def test_matches_a_naive_count_across_batches(self):
+        profiles = create_profiles(40)
+        rng = random.Random(7)
+        Follow.objects.bulk_create(
+            Follow(follower=follower, following=following)
+            for follower in profiles
+            for following in rng.sample(profiles, 6)
+            if follower != following
+        )
+        FollowSuggestion.objects.create(
+            profile=profiles[0], suggested=profiles[1], score=99
+        )
+
+        call_command("compute_suggestions", batch_size=7, limit=3, stdout=StringIO())
+
+        self.assertEqual(stored_suggestions(), expected_suggestions(limit=3))
+
+
+class SuggestionsViewTests(TestCase):
+    def setUp(self):
+        self.me, self.friend, self.other, self.star = create_profiles(4)
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+        Follow.objects.create(follower=self.friend, following=self.star)
+        Follow.objects.create(follower=self.other, following=self.star)
+        Follow.objects.create(follower=self.other, following=self.friend)
+
+    def follow(self, profile, action="follow"):
+        url = reverse(f"social_media_service:profile-{action}", args=[profile.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        jobs.run_pending()
+
+    def suggestions(self, profile):
+        url = reverse("social_media_service:profile-suggestions", args=[profile.pk])
+        return [
+            (row["username"], row["score"])
+            for row in self.client.get(url).data["results"]
+        ]
+
+    def test_follows_refresh_suggestions_incrementally(self):
+        self.assertEqual(self.suggestions(self.me), [])
+
+        self.follow(self.friend)
+        self.assertEqual(self.suggestions(self.me), [("suggest_3", 1)])
+
+        self.follow(self.other)
+        self.assertEqual(self.suggestions(self.me), [("suggest_3", 2)])
+
+        # Once followed, a profile is no longer suggested
+        self.follow(self.star)
+        self.assertEqual(self.suggestions(self.me), [])
+
+        self.follow(self.friend, "unfollow")
+        self.assertEqual(stored_suggestions(), expected_suggestions(limit=50))
+
+    def test_followers_gain_the_profiles_followed(self):
+        (fan,) = create_profiles(1, prefix="fan")
+        Follow.objects.create(follower=fan, following=self.me)
+
+        self.follow(self.star)
+        self.assertEqual(self.suggestions(fan), [("suggest_3", 1)])
+
+        self.follow(self.star, "unfollow")
+        self.assertEqual(self.suggestions(fan), [])
+
+    @override_settings(SUGGESTIONS_PER_PROFILE=1)
+    def test_followers_keep_only_their_best_suggestions(self):
+        (fan,) = create_profiles(1, prefix="fan")
+        for following in (self.me, self.friend, self.other):
+            Follow.objects.create(follower=fan, following=following)
+        call_command("compute_suggestions", limit=1, stdout=StringIO())
+        (newcomer,) = create_profiles(1, prefix="newcomer")
+
+        self.follow(newcomer)
+        self.assertEqual(self.suggestions(fan), [("suggest_3", 2)])
+        self.assertEqual(stored_suggestions(), expected_suggestions(limit=1))
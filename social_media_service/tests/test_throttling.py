@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from social_media_api.throttling import ScopedRateThrottle, UserRateThrottle
+from social_media_service.models import Post, Profile
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("throttle@test.com", "pass")
+        self.request = RequestFactory().get("/")
+        self.request.user = self.user
+        self.clock = Clock(1000.0)
+
+    def throttle(self, cls=UserRateThrottle, rate="4/m"):
+        throttle = cls()
+        throttle.rate = rate
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.timer = self.clock
+        return throttle
+
+    def allowed(self, count, **kwargs):
+        return [
+            self.throttle(**kwargs).allow_request(self.request, None)
+            for _ in range(count)
+        ]
+
+    def test_limits_requests_in_a_window(self):
+        # 1000 seconds is 40 seconds into a window of a minute
+        self.assertEqual(self.allowed(5), [True] * 4 + [False])
+
+        throttle = self.throttle()
+        self.assertFalse(throttle.allow_request(self.request, None))
+        # The counter of this window is full until it slides out of the next
+        self.assertAlmostEqual(throttle.wait(), 20 + 15)
+
+    def test_previous_window_is_weighed_by_its_overlap(self):
+        self.allowed(4)
+
+        # A quarter into the next window, 3 of the 4 requests still count
+        self.clock.now = 1035.0
+        self.assertEqual(self.allowed(2), [True, False])
+
+        throttle = self.throttle()
+        self.assertFalse(throttle.allow_request(self.request, None))
+        # Room for one more once half of the previous window slid out
+        self.assertAlmostEqual(throttle.wait(), 15)
+
+        self.clock.now = 1050.0
+        self.assertEqual(self.allowed(2), [True, False])
+
+    def test_refused_requests_are_not_counted(self):
+        self.assertEqual(self.allowed(10), [True] * 4 + [False] * 6)
+
+        self.clock.now = 1080.0
+        self.assertEqual(self.allowed(5), [True] * 4 + [False])
+
+    def test_one_counter_is_read_and_written_per_request(self):
+        self.allowed(50, rate="100/m")
+        with mock.patch.object(cache, "set") as set_:
+            self.assertTrue(
+                self.throttle(rate="100/m").allow_request(self.request, None)
+            )
+        set_.assert_not_called()
+        self.assertEqual(len(cache._cache), 1)
+
+    def test_scoped_throttle_uses_the_scope_of_the_view(self):
+        view = APIView()
+        self.assertTrue(ScopedRateThrottle().allow_request(self.request, view))
+
+        view.throttle_scope = "like"
+        throttle = ScopedRateThrottle()
+        throttle.timer = self.clock
+        self.assertTrue(throttle.allow_request(self.request, view))
+        self.assertEqual(throttle.key, f"throttle_like_{self.user.pk}")
+
+
+class ActionThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("scoped@test.com", "pass")
+        self.profile = Profile.objects.create(user=self.user, username="scoped")
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.profile, title="Scoped")
+
+    def test_write_actions_have_their_own_limits(self):
+        like = reverse("social_media_service:post-like", args=[self.post.pk])
+        comment = reverse("social_media_service:post-add-comment", args=[self.post.pk])
+
+        with mock.patch.dict(
+            ScopedRateThrottle.THROTTLE_RATES, {"like": "2/hour", "comment": "1/hour"}
+        ):
+            statuses = [self.client.post(like).status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+
+            response = self.client.post(comment, {"text": "First"})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.post(comment, {"text": "Second"})
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            # Reads only count against the user limit
+            response = self.client.get(reverse("social_media_service:post-list"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,19 +1,50 @@
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APIRequestFactory, force_authenticate, APIClient
 
-from social_media_service.models import Profile, Post, Comment
+from social_media_service import jobs, renditions, trending, uploads
+from social_media_service.models import (
+    Profile,
+    Post,
+    Comment,
+    Follow,
+    Like,
+    TimelineEntry,
+    UploadSession,
+    Job,
+)
 from social_media_service.serializers import (
     ProfileSerializer,
     PostSerializer,
     CommentSerializer,
+    CommentThreadSerializer,
 )
 from social_media_service.views import ProfileViewSet
+from user.serializers import TokenObtainPairSerializer
 
 PROFILE_URL = reverse("social_media_service:profile-list")
 POST_URL = reverse("social_media_service:post-list")
+UPLOAD_URL = reverse("social_media_service:uploadsession-list")
 
 
 def sample_profile(**params):
@@ -68,12 +99,22 @@ class ProfileViewSetTest(TestCase):
         serializer = ProfileSerializer(profiles, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), profiles.count())
-        for response_profile, serialized_profile in zip(response.data, serializer.data):
+        results = response.data["results"]
+        self.assertEqual(len(results), profiles.count())
+        for response_profile, serialized_profile in zip(results, serializer.data):
             self.assertEqual(
                 response_profile["username"], serialized_profile["username"]
             )
 
+    def test_search_profiles_by_username(self):
+        profile = sample_profile(user=self.user, username="dicaprio")
+
+        res = self.client.get(PROFILE_URL, {"username": "capri"})
+
+        self.assertEqual(
+            [item["username"] for item in res.data["results"]], [profile.username]
+        )
+
     def test_retrieve_profile_detail(self):
         profile = sample_profile(
             user=self.user,
@@ -141,9 +182,30 @@ class PostsTests(TestCase):
         serializer2 = PostSerializer(post2)
         serializer3 = PostSerializer(post3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
+
+    def test_search_posts_ranked_and_synced_on_save(self):
+        exact = sample_post(author=self.profile, title="django")
+        longer = sample_post(author=self.profile, title="django rest framework")
+        renamed = sample_post(author=self.profile, title="flask")
+
+        renamed.title = "django tips and tricks for everyone"
+        renamed.save()
+        res = self.client.get(POST_URL, {"title": "django"})
+
+        self.assertEqual(
+            [post["id"] for post in res.data["results"]],
+            [exact.id, longer.id, renamed.id],
+        )
+
+    def test_search_posts_short_term(self):
+        post = sample_post(author=self.profile, title="go")
+
+        res = self.client.get(POST_URL, {"title": "go"})
+
+        self.assertEqual([item["id"] for item in res.data["results"]], [post.id])
 
     def test_retrieve_post_detail(self):
         post = sample_post(author=self.profile)
@@ -155,6 +217,46 @@ class PostsTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_posts_keyset_pagination(self):
+        for index in range(5):
+            sample_post(author=self.profile, title=f"paged{index}")
+
+        res = self.client.get(POST_URL, {"title": "paged", "page_size": 2})
+        titles = [post["title"] for post in res.data["results"]]
+        self.assertIsNone(res.data["previous"])
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            titles += [post["title"] for post in res.data["results"]]
+
+        self.assertEqual(titles, [f"paged{index}" for index in reversed(range(5))])
+
+        res = self.client.get(res.data["previous"])
+        self.assertEqual(
+            [post["title"] for post in res.data["results"]], ["paged2", "paged1"]
+        )
+
+    def test_search_pages_through_every_match(self):
+        for index in range(12):
+            sample_post(
+                author=self.profile, title=f"django{' tips' * (index % 4)} {index}"
+            )
+
+        res = self.client.get(POST_URL, {"title": "django", "page_size": 100})
+        ranked = [post["id"] for post in res.data["results"]]
+        self.assertEqual(len(ranked), 12)
+
+        res = self.client.get(POST_URL, {"title": "django", "page_size": 5})
+        ids = [post["id"] for post in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [post["id"] for post in res.data["results"]]
+        self.assertEqual(ids, ranked)
+
+    def test_list_posts_invalid_cursor(self):
+        res = self.client.get(POST_URL, {"cursor": "bogus"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_like_post(self):
         post = sample_post(author=self.profile)
 
@@ -164,6 +266,19 @@ class PostsTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, {"detail": f"You are liked {post.title} now."})
 
+    def test_like_and_unlike_are_single_statement_writes(self):
+        post = sample_post(author=self.profile)
+        profile = self.profile
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(Like.objects.insert_ignore(profile=profile, post=post))
+            self.assertFalse(Like.objects.insert_ignore(profile=profile, post=post))
+            deleted, _ = Like.objects.filter(profile=profile, post=post).delete()
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Like.objects.filter(post=post).exists())
+
     def test_unlike_post(self):
         post = sample_post(author=self.profile)
 
@@ -181,10 +296,10 @@ class PostsTests(TestCase):
         url = reverse("social_media_service:post-comments", args=[post.pk])
         response = self.client.get(url)
         comments = Comment.objects.filter(post=post)
-        serializer = CommentSerializer(comments, many=True)
+        serializer = CommentThreadSerializer(comments, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_add_comment(self):
         post = sample_post(author=self.profile)
@@ -229,3 +344,1023 @@ class PostsTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(exists)
+
+
+class CommentThreadsTests(TestCase):
+    def setUp(self):
+        # The tests post more comments than the comment throttle lets through
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("thread@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="threader")
+        self.post = sample_post(author=self.profile, title="threaded")
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def comment(self, text, parent=None, post=None):
+        post = post or self.post
+        url = reverse("social_media_service:post-add-comment", args=[post.pk])
+        data = {"text": text} if parent is None else {"text": text, "parent": parent}
+        return self.client.post(url, data)
+
+    def thread(self, replies):
+        top = self.comment("top").data["id"]
+        for index in range(replies):
+            self.comment(f"reply {index}", parent=top)
+        return top
+
+    def list_comments(self, **params):
+        url = reverse("social_media_service:post-comments", args=[self.post.pk])
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_top_level_comments_come_with_their_first_replies(self):
+        quiet = self.comment("quiet").data["id"]
+        busy = self.thread(replies=4)
+        # A reply to a reply joins the thread of the top-level comment
+        first_reply = Comment.objects.filter(parent=busy).order_by("pk")[0]
+        res = self.comment("nested", parent=first_reply.pk)
+        self.assertEqual(res.data["parent"], busy)
+
+        results = self.list_comments()["results"]
+
+        self.assertEqual([row["id"] for row in results], [busy, quiet])
+        self.assertEqual(results[0]["replies_count"], 5)
+        self.assertEqual(
+            [reply["text"] for reply in results[0]["replies"]],
+            ["reply 0", "reply 1", "reply 2"],
+        )
+        self.assertEqual(results[0]["replies"][0]["profile"], "threader")
+        self.assertEqual(results[1]["replies"], [])
+
+    def test_query_count_does_not_grow_with_threads(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.list_comments()
+            return len(queries)
+
+        self.thread(replies=2)
+        few = count_queries()
+        for replies in range(6):
+            self.thread(replies)
+        self.assertEqual(count_queries(), few)
+
+    def test_replies_are_paged_oldest_first(self):
+        top = self.thread(replies=5)
+        url = reverse("social_media_service:post-replies", args=[self.post.pk, top])
+
+        texts, pages = [], 0
+        url += "?page_size=2"
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            texts += [reply["text"] for reply in res.data["results"]]
+            pages += 1
+            url = res.data["next"]
+
+        self.assertEqual(pages, 3)
+
+        self.assertEqual(texts, [f"reply {index}" for index in range(5)])
+
+    def test_replies_stay_on_the_post(self):
+        other = sample_post(author=self.profile, title="elsewhere")
+        top = self.comment("top", post=other).data["id"]
+
+        res = self.comment("reply", parent=top)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("parent", res.data)
+
+        url = reverse("social_media_service:post-replies", args=[self.post.pk, top])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_lookups_are_scoped_to_the_post(self):
+        other = sample_post(author=self.profile, title="elsewhere")
+        comment = self.comment("mine", post=other).data["id"]
+
+        for name, method in [("update", "put"), ("delete", "delete")]:
+            for args in [(self.post.pk, comment), (other.pk, 10**9), (other.pk, "x")]:
+                with self.subTest(name, args=args):
+                    url = reverse(
+                        f"social_media_service:post-{name}-comment", args=args
+                    )
+                    res = getattr(self.client, method)(url, {"text": "moved"})
+                    self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(Comment.objects.get(pk=comment).text, "mine")
+
+    def test_deletes_update_the_thread_and_the_post(self):
+        top = self.thread(replies=3)
+        reply = Comment.objects.filter(parent=top).first()
+        url = reverse(
+            "social_media_service:post-delete-comment", args=[self.post.pk, reply.pk]
+        )
+        self.client.delete(url)
+        self.assertEqual(Comment.objects.get(pk=top).replies_count, 2)
+
+        url = reverse(
+            "social_media_service:post-delete-comment", args=[self.post.pk, top]
+        )
+        self.client.delete(url)
+        self.post.refresh_from_db()
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+        self.assertEqual(self.post.comments_count, 0)
+        # Only the creation of the post is left in its score
+        self.assertAlmostEqual(
+            self.post.trending_score,
+            trending.event_score("post", self.post.created_at),
+            places=4,
+        )
+
+
+class FollowingPostsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "reader@test.com",
+            "testpass1",
+        )
+        self.profile = sample_profile(user=self.user, username="reader")
+        self.author = sample_profile(
+            user=get_user_model().objects.create_user("author@test.com", "pass"),
+            username="author",
+        )
+        self.client.force_authenticate(self.user)
+
+    def follow(self, profile):
+        url = reverse("social_media_service:profile-follow", args=[profile.pk])
+        return self.client.post(url)
+
+    def following_posts(self):
+        url = reverse(
+            "social_media_service:profile-following-posts", args=[self.profile.pk]
+        )
+        return self.client.get(url)
+
+    def test_following_posts_include_new_and_backfilled_posts(self):
+        old_post = sample_post(author=self.author, title="old")
+        self.follow(self.author)
+        new_post = sample_post(author=self.author, title="new")
+        sample_post(author=self.profile, title="own")
+
+        res = self.following_posts()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post["title"] for post in res.data["results"]],
+            [new_post.title, old_post.title],
+        )
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_backfill_copies_the_newest_posts_of_each_author(self):
+        other = sample_profile(
+            user=get_user_model().objects.create_user("other@test.com", "pass"),
+            username="other",
+        )
+        for index in range(3):
+            sample_post(author=self.author, title=f"author {index}")
+            sample_post(author=other, title=f"other {index}")
+        self.follow(self.author)
+        self.follow(other)
+
+        res = self.following_posts()
+
+        self.assertEqual(
+            [post["title"] for post in res.data["results"]],
+            ["other 2", "author 2", "other 1", "author 1"],
+        )
+
+    def test_unfollow_removes_posts_from_timeline(self):
+        self.follow(self.author)
+        sample_post(author=self.author, title="gone")
+        url = reverse("social_media_service:profile-unfollow", args=[self.author.pk])
+        self.client.post(url)
+
+        res = self.following_posts()
+
+        self.assertEqual(res.data["results"], [])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_high_fanout_author_posts_are_pulled(self):
+        self.follow(self.author)
+        post = sample_post(author=self.author, title="celebrity")
+
+        res = self.following_posts()
+
+        post.refresh_from_db()
+        self.assertTrue(post.fanout_skipped)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual([post["title"] for post in res.data["results"]], ["celebrity"])
+
+    def test_pages_merge_entries_with_pulled_posts(self):
+        star = sample_profile(
+            user=get_user_model().objects.create_user("star@test.com", "pass"),
+            username="star",
+        )
+        self.follow(self.author)
+        self.follow(star)
+        Profile.objects.filter(pk=star.pk).update(followers_count=2)
+        with override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=2):
+            for index in range(7):
+                sample_post(author=[self.author, star][index % 2], title=str(index))
+
+        url = reverse(
+            "social_media_service:profile-following-posts", args=[self.profile.pk]
+        )
+        titles, url = [], url + "?page_size=2"
+        while url:
+            res = self.client.get(url)
+            titles += [post["title"] for post in res.data["results"]]
+            url = res.data["next"]
+
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.profile).count(), 4)
+        self.assertEqual(titles, [str(index) for index in reversed(range(7))])
+
+
+class EngagementCountersTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "counter@test.com",
+            "testpass1",
+        )
+        self.profile = sample_profile(user=self.user, username="counter")
+        self.other = sample_profile(
+            user=get_user_model().objects.create_user("other@test.com", "pass"),
+            username="other",
+        )
+        self.post = sample_post(author=self.other, title="counted")
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike_update_likes_count(self):
+        self.client.post(reverse("social_media_service:post-like", args=[self.post.pk]))
+        self.client.post(reverse("social_media_service:post-like", args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+        self.client.post(
+            reverse("social_media_service:post-unlike", args=[self.post.pk])
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_follow_and_unfollow_update_follow_counts(self):
+        url = reverse("social_media_service:profile-follow", args=[self.other.pk])
+        self.client.post(url)
+        self.profile.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.profile.following_count, 1)
+        self.assertEqual(self.other.followers_count, 1)
+
+        url = reverse("social_media_service:profile-unfollow", args=[self.other.pk])
+        self.client.post(url)
+        self.profile.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.profile.following_count, 0)
+        self.assertEqual(self.other.followers_count, 0)
+
+    def test_comments_and_posts_update_counts(self):
+        url = reverse("social_media_service:post-add-comment", args=[self.post.pk])
+        res = self.client.post(url, {"text": "first"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+        url = reverse(
+            "social_media_service:post-delete-comment",
+            args=[self.post.pk, res.data["id"]],
+        )
+        self.client.delete(url)
+        res = self.client.post(
+            POST_URL, {"title": "mine", "content": "text", "author": self.profile.pk}
+        )
+        self.post.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.profile.posts_count, 1)
+        self.assertEqual(res.data["likes_count"], 0)
+
+    def test_reconcile_counters_command(self):
+        comment = Comment.objects.create(
+            post=self.post, profile=self.profile, text="raw"
+        )
+        Comment.objects.create(
+            post=self.post, profile=self.other, parent=comment, text="reply"
+        )
+        Follow.objects.create(follower=self.profile, following=self.other)
+        Profile.objects.filter(pk=self.profile.pk).update(posts_count=7)
+
+        call_command("reconcile_counters", batch_size=1, stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.other.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(comment.replies_count, 1)
+        self.assertEqual(self.profile.posts_count, 0)
+        self.assertEqual(self.profile.following_count, 1)
+        self.assertEqual(self.other.followers_count, 1)
+        self.assertEqual(self.other.posts_count, 1)
+
+    def test_deleting_a_profile_takes_back_its_engagement(self):
+        other_client = APIClient()
+        other_client.force_authenticate(self.other.user)
+        comment_url = reverse(
+            "social_media_service:post-add-comment", args=[self.post.pk]
+        )
+        thread = other_client.post(comment_url, {"text": "thread"}).data["id"]
+        other_client.post(
+            reverse("social_media_service:profile-follow", args=[self.profile.pk])
+        )
+        self.post.refresh_from_db()
+        score, version = self.post.trending_score, self.post.version
+
+        self.client.post(
+            reverse("social_media_service:profile-follow", args=[self.other.pk])
+        )
+        self.client.post(reverse("social_media_service:post-like", args=[self.post.pk]))
+        self.client.post(comment_url, {"text": "reply", "parent": thread})
+        self.client.post(comment_url, {"text": "own"})
+        self.client.delete(
+            reverse("social_media_service:profile-detail", args=[self.profile.pk])
+        )
+
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertAlmostEqual(self.post.trending_score, score)
+        self.assertGreater(self.post.version, version)
+        self.assertEqual(Comment.objects.get(pk=thread).replies_count, 0)
+        self.assertEqual(self.other.followers_count, 0)
+        self.assertEqual(self.other.following_count, 0)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("trend@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="trend")
+        self.client.force_authenticate(self.user)
+        self.old = sample_post(author=self.profile, title="old")
+        self.new = sample_post(author=self.profile, title="new")
+        # The old post was made a day ago, two half-lives back
+        Post.objects.filter(pk=self.old.pk).update(
+            trending_score=trending.event_score(
+                "post", self.old.created_at - timedelta(days=1)
+            )
+        )
+
+    def trending_titles(self):
+        res = self.client.get(reverse("social_media_service:post-trending"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Leaves out the posts of the fixture
+        return [
+            post["title"]
+            for post in res.data["results"]
+            if post["title"] in ("old", "new")
+        ]
+
+    def score(self, post):
+        post.refresh_from_db(fields=["trending_score"])
+        return post.trending_score
+
+    def test_events_decay_with_the_half_life(self):
+        now = timezone.now()
+        later = now + timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        self.assertAlmostEqual(
+            trending.event_score("like", later) - trending.event_score("like", now),
+            math.log(2),
+        )
+
+    def test_engagement_ranks_posts_and_is_taken_back(self):
+        self.assertEqual(self.trending_titles(), ["new", "old"])
+        baseline = self.score(self.old)
+
+        # Liked now, the old post counts 1 + 1/4 against the new post's 1
+        like = reverse("social_media_service:post-like", args=[self.old.pk])
+        self.client.post(like)
+        self.assertAlmostEqual(
+            self.score(self.old), math.log(1.25) + self.score(self.new), 4
+        )
+        self.assertEqual(self.trending_titles(), ["old", "new"])
+
+        self.client.post(
+            reverse("social_media_service:post-unlike", args=[self.old.pk])
+        )
+        self.assertAlmostEqual(self.score(self.old), baseline, 4)
+        self.assertEqual(self.trending_titles(), ["new", "old"])
+
+    def test_comments_and_bulk_likes_update_scores(self):
+        url = reverse("social_media_service:post-add-comment", args=[self.old.pk])
+        res = self.client.post(url, {"text": "Hot"})
+        self.assertEqual(self.trending_titles(), ["old", "new"])
+
+        url = reverse(
+            "social_media_service:post-delete-comment",
+            args=[self.old.pk, res.data["id"]],
+        )
+        self.client.delete(url)
+        self.assertEqual(self.trending_titles(), ["new", "old"])
+
+        baseline = self.score(self.new)
+        bulk_like = reverse("social_media_service:post-bulk-like")
+        self.client.post(bulk_like, {"ids": [self.new.pk]}, format="json")
+        self.assertAlmostEqual(self.score(self.new), baseline + math.log(2), 4)
+
+        bulk_unlike = reverse("social_media_service:post-bulk-unlike")
+        self.client.post(bulk_unlike, {"ids": [self.new.pk]}, format="json")
+        self.assertAlmostEqual(self.score(self.new), baseline, 4)
+
+    def test_trending_reads_the_top_of_the_index(self):
+        queryset = Post.objects.order_by("-trending_score", "-id")[:20]
+        self.assertIn("post_trending_idx", queryset.explain())
+
+
+class GenerateDataTests(TestCase):
+    def test_generate_data_command(self):
+        call_command(
+            "generate_data",
+            users=300,
+            posts=2,
+            follows=10,
+            likes=3,
+            comments=1,
+            batch_size=70,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+        profiles = Profile.objects.filter(username__startswith="gen_")
+        self.assertEqual(profiles.count(), 300)
+        self.assertFalse(Follow.objects.filter(follower=F("following")).exists())
+        self.assertTrue(Post.objects.filter(author__in=profiles).exists())
+        self.assertTrue(Like.objects.exists())
+        self.assertTrue(Comment.objects.exists())
+
+        # Counters match the rows and in-degrees are heavily skewed
+        counts = list(profiles.values_list("followers_count", flat=True))
+        self.assertEqual(sum(counts), Follow.objects.count())
+        self.assertGreater(max(counts), 10 * sum(counts) / len(counts))
+
+        # Timelines hold every post of the followed profiles
+        owner = Follow.objects.first().follower
+        expected = set(
+            Post.objects.filter(author__followers__follower=owner).values_list(
+                "id", flat=True
+            )
+        )
+        entries = set(owner.timeline_entries.values_list("post_id", flat=True))
+        self.assertEqual(entries, expected)
+
+        with self.assertRaises(CommandError):
+            call_command("generate_data", users=1, stdout=StringIO())
+
+
+class BulkActionsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("bulk@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="bulk")
+        self.others = [
+            sample_profile(
+                user=get_user_model().objects.create_user(f"bulk{index}@test.com"),
+                username=f"bulk{index}",
+            )
+            for index in range(3)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_follow_reports_outcome_per_id(self):
+        Follow.objects.create(follower=self.profile, following=self.others[0])
+        ids = [profile.pk for profile in self.others] + [self.profile.pk, 999999]
+
+        res = self.client.post(
+            reverse("social_media_service:profile-bulk-follow"),
+            {"ids": ids},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["status"] for item in res.data],
+            ["already_following", "followed", "followed", "self", "not_found"],
+        )
+        self.assertEqual(
+            Follow.objects.filter(follower=self.profile).count(), len(self.others)
+        )
+        self.others[1].refresh_from_db()
+        self.assertEqual(self.others[1].followers_count, 1)
+
+    def test_bulk_unfollow(self):
+        Follow.objects.create(follower=self.profile, following=self.others[0])
+
+        res = self.client.post(
+            reverse("social_media_service:profile-bulk-unfollow"),
+            {"ids": [self.others[0].pk, self.others[1].pk]},
+            format="json",
+        )
+
+        self.assertEqual(
+            [item["status"] for item in res.data], ["unfollowed", "not_following"]
+        )
+        self.assertFalse(Follow.objects.filter(follower=self.profile).exists())
+
+    def test_bulk_like_and_unlike(self):
+        posts = [
+            sample_post(author=self.others[0], title=f"bulk post {index}")
+            for index in range(2)
+        ]
+        ids = [post.pk for post in posts]
+
+        res = self.client.post(
+            reverse("social_media_service:post-bulk-like"),
+            {"ids": ids + [ids[0]]},
+            format="json",
+        )
+        self.assertEqual([item["status"] for item in res.data], ["liked", "liked"])
+        self.assertEqual(Like.objects.filter(profile=self.profile).count(), 2)
+
+        res = self.client.post(
+            reverse("social_media_service:post-bulk-unlike"),
+            {"ids": ids[:1]},
+            format="json",
+        )
+        self.assertEqual([item["status"] for item in res.data], ["unliked"])
+        posts[0].refresh_from_db()
+        self.assertEqual(posts[0].likes_count, 0)
+
+    def test_bulk_follow_queries_do_not_grow_with_the_ids(self):
+        def follow(count):
+            profiles = [
+                sample_profile(
+                    user=get_user_model().objects.create_user(f"many{count}-{index}"),
+                    username=f"many{count}-{index}",
+                )
+                for index in range(count)
+            ]
+            for profile in profiles:
+                sample_post(author=profile, title=f"{profile.username} post")
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(
+                    reverse("social_media_service:profile-bulk-follow"),
+                    {"ids": [profile.pk for profile in profiles]},
+                    format="json",
+                )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(follow(2), follow(30))
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.profile).count(), 32)
+
+    def test_bulk_follow_rejects_empty_list(self):
+        res = self.client.post(
+            reverse("social_media_service:profile-bulk-follow"),
+            {"ids": []},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("etag@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="etag")
+        self.post = sample_post(author=self.profile, title="tagged")
+        self.client.force_authenticate(self.user)
+
+    def assert_not_modified_until_write(self, url, write):
+        res = self.client.get(url)
+        etag = res["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+
+        write()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_post_detail(self):
+        url = reverse("social_media_service:post-detail", args=[self.post.pk])
+        self.assert_not_modified_until_write(
+            url,
+            lambda: self.client.post(
+                reverse("social_media_service:post-like", args=[self.post.pk])
+            ),
+        )
+
+    def test_profile_detail(self):
+        url = reverse("social_media_service:profile-detail", args=[self.profile.pk])
+        self.assert_not_modified_until_write(
+            url,
+            lambda: self.client.patch(
+                reverse("user:manage"), {"email": "new@test.com"}
+            ),
+        )
+
+    def test_post_comments(self):
+        comment = Comment.objects.create(
+            post=self.post, profile=self.profile, text="first"
+        )
+        url = reverse("social_media_service:post-comments", args=[self.post.pk])
+        self.assert_not_modified_until_write(
+            url,
+            lambda: self.client.put(
+                reverse(
+                    "social_media_service:post-update-comment",
+                    args=[self.post.pk, comment.pk],
+                ),
+                {"text": "edited"},
+            ),
+        )
+
+    def test_post_comments_follow_commenter_renames(self):
+        Comment.objects.create(post=self.post, profile=self.profile, text="first")
+        url = reverse("social_media_service:post-comments", args=[self.post.pk])
+        self.assert_not_modified_until_write(
+            url,
+            lambda: self.client.patch(
+                reverse("social_media_service:profile-detail", args=[self.profile.pk]),
+                {"username": "renamed"},
+            ),
+        )
+
+    def test_save_bumps_version(self):
+        self.post.title = "renamed"
+        with self.assertNumQueries(1):
+            self.post.save()
+        self.assertEqual(self.post.version, 2)
+
+
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("cached@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="cached")
+        self.post = sample_post(author=self.profile, title="cached post")
+        self.client.force_authenticate(self.user)
+
+    def test_hot_objects_are_served_without_sql(self):
+        for url in (
+            reverse("social_media_service:post-detail", args=[self.post.pk]),
+            reverse("social_media_service:profile-detail", args=[self.profile.pk]),
+        ):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.data, second.data)
+
+    def test_writes_invalidate_cached_objects(self):
+        url = reverse("social_media_service:post-detail", args=[self.post.pk])
+        self.client.get(url)
+
+        self.client.post(reverse("social_media_service:post-like", args=[self.post.pk]))
+        self.assertEqual(self.client.get(url).data["likes_count"], 1)
+
+        self.post.refresh_from_db()
+        self.post.content = "changed"
+        self.post.save()
+        self.assertEqual(self.client.get(url).data["content"], "changed")
+
+        self.post.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_updates_do_not_write_back_cached_rows(self):
+        url = reverse("social_media_service:post-detail", args=[self.post.pk])
+        self.client.get(url)
+        # Written by another process, whose invalidation never reaches this cache
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=5, version=F("version") + 1
+        )
+
+        res = self.client.patch(url, {"title": "renamed"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, "renamed")
+        self.assertEqual(self.post.likes_count, 5)
+        self.assertEqual(self.post.version, 3)
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0)
+class ImageRenditionsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("media@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="media")
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        image = BytesIO()
+        Image.new("RGB", (2000, 1000), "red").save(image, format="PNG")
+        image.seek(0)
+        image.name = "large.png"
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                POST_URL,
+                {
+                    "title": "with media",
+                    "content": "text",
+                    "author": self.profile.pk,
+                    "media": image,
+                },
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res
+
+    def test_upload_returns_before_renditions_exist(self):
+        res = self.upload()
+        self.assertEqual(res.data["media_renditions"], {})
+        self.assertTrue(Job.objects.filter(name__endswith="make_renditions").exists())
+
+    def test_renditions_are_exposed_once_made(self):
+        res = self.upload()
+        jobs.run_pending()
+        res = self.client.get(
+            reverse("social_media_service:post-detail", args=[res.data["id"]])
+        )
+        renditions = res.data["media_renditions"]
+        self.assertEqual(set(renditions), {"thumbnail", "feed", "full"})
+        self.assertEqual(set(renditions["feed"]), {"webp", "jpeg"})
+
+        post = Post.objects.get(pk=res.data["id"])
+        path = post.media_renditions["feed"]["webp"]
+        with Image.open(os.path.join(settings.MEDIA_ROOT, path)) as feed:
+            self.assertEqual(feed.format, "WEBP")
+            self.assertEqual(feed.size, (720, 360))
+
+    @override_settings(IMAGE_RENDITION_WORKERS=1)
+    def test_renditions_are_made_in_a_process_pool(self):
+        res = self.upload()
+        with mock.patch.object(renditions, "_executor", None):
+            jobs.run_pending()
+            executor = renditions._executor
+        executor.shutdown()
+
+        self.assertIsInstance(executor, ProcessPoolExecutor)
+        post = Post.objects.get(pk=res.data["id"])
+        self.assertEqual(
+            set(post.media_renditions), {"source", "thumbnail", "feed", "full"}
+        )
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("upload@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="uploader")
+        self.client.force_authenticate(self.user)
+
+        image = BytesIO()
+        Image.new("RGB", (64, 64), "blue").save(image, format="PNG")
+        self.content = image.getvalue()
+
+    def create_session(self):
+        res = self.client.post(
+            UPLOAD_URL, {"filename": "blue.png", "size": len(self.content)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return reverse(
+            "social_media_service:uploadsession-detail", args=[res.data["id"]]
+        )
+
+    def put_range(self, url, start, end):
+        stop = end + 1
+        return self.client.generic(
+            "PUT",
+            url,
+            self.content[start:stop],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(self.content)}",
+        )
+
+    def upload(self):
+        url = self.create_session()
+        middle = len(self.content) // 2
+        self.assertEqual(self.put_range(url, 0, middle - 1).data["received"], middle)
+        res = self.put_range(url, middle, len(self.content) - 1)
+        self.assertEqual(res.data["received"], len(self.content))
+        res = self.client.post(url + "finalize/")
+        self.assertTrue(res.data["completed"])
+        return res.data["id"]
+
+    def test_chunks_must_resume_where_the_upload_left_off(self):
+        url = self.create_session()
+        self.put_range(url, 0, 9)
+
+        res = self.put_range(url, 20, 29)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        res = self.client.post(url + "finalize/")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url).data["received"], 10)
+
+    def test_chunk_is_rejected_if_the_upload_moved_while_it_was_written(self):
+        url = self.create_session()
+        write_chunk = uploads.write_chunk
+
+        def write_concurrently(target, stream, start, length):
+            # Another request, which stored its position in the meantime
+            UploadSession.objects.update(received=5)
+            return write_chunk(target, stream, start, length)
+
+        with mock.patch.object(uploads, "write_chunk", write_concurrently):
+            res = self.put_range(url, 0, 9)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get(url).data["received"], 5)
+
+    def test_finalized_upload_is_attached_to_a_post(self):
+        upload_id = self.upload()
+        res = self.client.post(
+            POST_URL,
+            {
+                "title": "uploaded",
+                "content": "text",
+                "author": self.profile.pk,
+                "media_upload": upload_id,
+            },
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        post = Post.objects.get(pk=res.data["id"])
+        self.assertTrue(post.media.name.startswith("uploads/post_image/uploaded-"))
+        with post.media.open("rb") as media:
+            self.assertEqual(media.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_unfinished_upload_cannot_be_attached(self):
+        url = self.create_session()
+        upload_id = url.rstrip("/").rsplit("/", 1)[-1]
+        res = self.client.patch(
+            reverse("social_media_service:profile-detail", args=[self.profile.pk]),
+            {"profile_picture_upload": upload_id},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PerformanceInstrumentationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("perf@test.com", "pass")
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs("social_media_api.performance", "INFO") as logs:
+            res = self.client.get(POST_URL)
+
+        timing = res["Server-Timing"]
+        for name in ("db", "auth", "serialize", "total"):
+            self.assertIn(f"{name};dur=", timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+        self.assertEqual(len(logs.records), 1)
+        metrics = logs.records[0].metrics
+        self.assertEqual(metrics["view"], "social_media_service:post-list")
+        self.assertEqual(metrics["status"], status.HTTP_200_OK)
+        self.assertGreater(metrics["queries"], 0)
+        self.assertGreater(metrics["serialize_ms"], 0)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_server_timing_header_can_be_disabled(self):
+        res = self.client.get(POST_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+
+class AsyncReadViewsMixin:
+    def make_data(self):
+        self.user = get_user_model().objects.create_user("async@test.com", "pass")
+        self.profile = sample_profile(user=self.user, username="async")
+        self.other = sample_profile(
+            user=get_user_model().objects.create_user("other@test.com", "pass"),
+            username="other",
+        )
+        self.post = sample_post(author=self.other, title="async post")
+        comment = Comment.objects.create(
+            post=self.post, profile=self.profile, text="hi", replies_count=1
+        )
+        Comment.objects.create(
+            post=self.post, profile=self.other, parent=comment, text="hello"
+        )
+        Follow.objects.create(follower=self.profile, following=self.other)
+        Follow.objects.create(follower=self.other, following=self.profile)
+        Like.objects.create(profile=self.profile, post=self.post)
+        TimelineEntry.objects.create(
+            owner=self.profile,
+            post=self.post,
+            author=self.other,
+            created_at=self.post.created_at,
+        )
+
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.async_client = AsyncClient()
+        self.authorization = f"Bearer {token}"
+
+    def call_async(self, method, url, **headers):
+        async def request():
+            return await getattr(self.async_client, method)(url, **headers)
+
+        return async_to_sync(request)()
+
+    def get_async(self, url, **headers):
+        return self.call_async("get", url, authorization=self.authorization, **headers)
+
+    def routes(self):
+        profile_routes = ("followers", "following", "following-posts", "liked-posts")
+        return [
+            ("post-list", []),
+            ("post-detail", [self.post.pk]),
+            ("post-comments", [self.post.pk]),
+            *[(f"profile-{route}", [self.profile.pk]) for route in profile_routes],
+        ]
+
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=False)
+class AsyncReadViewsTests(AsyncReadViewsMixin, TestCase):
+    def setUp(self):
+        self.make_data()
+
+    def test_responses_match_the_viewsets(self):
+        for name, args in self.routes():
+            with self.subTest(name):
+                expected = self.client.get(
+                    reverse(f"social_media_service:{name}", args=args)
+                )
+                res = self.get_async(
+                    reverse(f"social_media_service:async:{name}", args=args)
+                )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.json(), expected.json())
+                self.assertEqual(res.get("ETag"), expected.get("ETag"))
+
+    def test_requires_authentication(self):
+        res = self.call_async("get", reverse("social_media_service:async:post-list"))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_missing_profile(self):
+        url = reverse("social_media_service:async:profile-followers", args=[999])
+
+        self.assertEqual(self.get_async(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_not_modified(self):
+        url = reverse("social_media_service:async:post-detail", args=[self.post.pk])
+        etag = self.get_async(url)["ETag"]
+
+        res = self.get_async(url, if_none_match=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_only_reads(self):
+        res = self.call_async(
+            "post",
+            reverse("social_media_service:async:post-list"),
+            authorization=self.authorization,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class ConcurrentAsyncReadViewsTests(AsyncReadViewsMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.make_data()
+
+    def test_queries_run_on_worker_connections(self):
+        for name, args in self.routes():
+            with self.subTest(name):
+                expected = self.client.get(
+                    reverse(f"social_media_service:{name}", args=args)
+                )
+                res = self.get_async(
+                    reverse(f"social_media_service:async:{name}", args=args)
+                )
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res.json(), expected.json())
+
+        url = reverse("social_media_service:async:profile-followers", args=[999])
+        self.assertEqual(self.get_async(url).status_code, status.HTTP_404_NOT_FOUND)
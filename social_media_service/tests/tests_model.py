@@ -1,3 +1,4 @@
+from django.db import IntegrityError
 from django.test import TestCase
 from django.utils import timezone
 
@@ -72,6 +73,10 @@ class FollowModelTest(BaseModelTest):
         self.assertEqual(self.profile, self.follow.follower)
         self.assertEqual(self.profile, self.follow.following)
 
+    def test_follow_unique(self):
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(follower=self.profile, following=self.profile)
+
 
 class LikeModelTest(BaseModelTest):
     def test_like_create(self):
@@ -79,6 +84,32 @@ class LikeModelTest(BaseModelTest):
         self.assertEqual(self.post, self.like.post)
         self.assertIsNotNone(self.like.created_at)
 
+    def test_like_unique(self):
+        with self.assertRaises(IntegrityError):
+            Like.objects.create(profile=self.profile, post=self.post)
+
+    def test_insert_ignore_many_returns_the_rows_written(self):
+        other = Post.objects.create(author=self.profile, title="Other", content="")
+        likes = [Like(profile=self.profile, post=post) for post in (self.post, other)]
+
+        self.assertEqual(
+            Like.objects.insert_ignore_many(likes, returning="post_id"), [other.pk]
+        )
+        self.assertEqual(
+            Like.objects.insert_ignore_many(likes, returning="post_id"), []
+        )
+
+    def test_delete_returning_returns_the_rows_deleted(self):
+        deleted = Like.objects.delete_returning(
+            "post_id", "created_at", profile=self.profile, post_id__in=[self.post.pk, 0]
+        )
+
+        self.assertEqual(deleted, [(self.post.pk, self.like.created_at)])
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(
+            Like.objects.delete_returning("post_id", profile=self.profile), []
+        )
+
 
 class CommentModelTest(BaseModelTest):
     def test_comment_create(self):
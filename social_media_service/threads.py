@@ -0,0 +1,55 @@
+"""Comment threads: top-level comments with a preview of their replies.
+
+A reply points to the top-level comment of its thread through ``parent``
+(replying to a reply joins the same thread), and the parent counts its
+replies in ``replies_count``. The comments of a post are listed a page of
+top-level comments at a time, newest first, from comment_post_top_idx;
+``attach_replies`` then loads the first COMMENT_REPLIES_PREVIEW replies of
+every comment on the page with one more query, and the rest of a thread is
+paged oldest first from comment_thread_idx.
+
+The preview query selects, for each parent, the id of its ``i``-th reply
+with one ``LIMIT 1 OFFSET i`` seek of comment_thread_idx per position, so
+it reads a few index entries per parent however long its thread is.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Comment
+
+
+def first_replies(post, parent_ids, count):
+    """Returns the first ``count`` replies of each comment as ``{parent id: [replies]}``"""
+    if not parent_ids or count <= 0:
+        return {}
+
+    replies = Comment.objects.filter(parent=OuterRef("pk")).order_by("created_at", "id")
+    parents = Comment.objects.filter(pk__in=parent_ids)
+    condition = Q()
+    for position in range(count):
+        stop = position + 1
+        nth = Subquery(replies.values("pk")[position:stop])
+        condition |= Q(pk__in=parents.values(reply=nth))
+
+    threads = {}
+    # Not filtered by post, which would lead SQLite to scan all its comments
+    for reply in (
+        Comment.objects.filter(condition)
+        .select_related("profile")
+        .order_by("parent_id", "created_at", "id")
+    ):
+        reply.post = post
+        threads.setdefault(reply.parent_id, []).append(reply)
+    return threads
+
+
+def attach_replies(post, comments):
+    """Sets ``preview`` on each top-level comment to its first replies"""
+    threads = first_replies(
+        post,
+        [comment.pk for comment in comments if comment.replies_count],
+        settings.COMMENT_REPLIES_PREVIEW,
+    )
+    for comment in comments:
+        comment.preview = threads.get(comment.pk, [])
+    return comments
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+
+def is_high_fanout(author_id):
+    """Returns True if posts by the author are pulled at read time instead of fanned out"""
+    return Profile.objects.filter(
+        pk=author_id, followers_count__gte=settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def _write_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    """Writes a new post into the timelines of its author's followers"""
+    if is_high_fanout(post.author_id):
+        Post.objects.filter(pk=post.pk).update(fanout_skipped=True)
+        post.fanout_skipped = True
+        return
+
+    follower_ids = Follow.objects.filter(following_id=post.author_id).values_list(
+        "follower_id", flat=True
+    )
+    batch = []
+    for follower_id in follower_ids.iterator(
+        chunk_size=settings.TIMELINE_FANOUT_BATCH_SIZE
+    ):
+        batch.append(
+            TimelineEntry(
+                owner_id=follower_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                created_at=post.created_at,
+            )
+        )
+        if len(batch) >= settings.TIMELINE_FANOUT_BATCH_SIZE:
+            _write_entries(batch)
+            batch = []
+    if batch:
+        _write_entries(batch)
+
+
+def backfill(follower_id, following_ids):
+    """Copies the recent fanned-out posts of newly followed profiles into a timeline.
+
+    The TIMELINE_BACKFILL_LIMIT newest posts of every profile are read with
+    one query, ranking the posts of each author with ROW_NUMBER().
+    """
+    if not following_ids:
+        return
+    ranked = (
+        Post.objects.filter(author_id__in=following_ids, fanout_skipped=False)
+        .annotate(
+            recency=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("created_at").desc(), F("id").desc()),
+            )
+        )
+        .values("id", "author_id", "created_at", "recency")
+    )
+    # Django cannot filter on a window function, so the ranked rows are a subquery
+    sql, params = ranked.query.sql_with_params()
+    posts = Post.objects.raw(
+        f"SELECT id, author_id, created_at FROM ({sql}) ranked WHERE recency <= %s",
+        (*params, settings.TIMELINE_BACKFILL_LIMIT),
+    )
+    _write_entries(
+        [
+            TimelineEntry(
+                owner_id=follower_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                created_at=post.created_at,
+            )
+            for post in posts
+        ]
+    )
+
+
+def evict(follower_id, following_ids):
+    """Removes the posts of unfollowed profiles from a timeline"""
+    TimelineEntry.objects.filter(
+        owner_id=follower_id, author_id__in=following_ids
+    ).delete()
+
+
+class Timeline:
+    """The home timeline of a profile, read a page at a time by TimelinePagination.
+
+    Materialized entries are a range of timeline_owner_recent_idx. Posts of
+    the high fan-out authors the profile follows are pulled with a range of
+    post_pulled_author_idx per author, bounded like the page, and merged
+    with them on ``(created_at, post_id)``.
+    """
+
+    model = TimelineEntry
+    # The columns of each row: FastPostListSerializer's, then the ordering ones
+    columns = ("title", "author_username", "post_id", "created_at")
+
+    def __init__(self, profile_id):
+        self.profile_id = profile_id
+
+    def entries(self, ordering, condition, limit):
+        return (
+            TimelineEntry.objects.filter(owner_id=self.profile_id)
+            .filter(condition)
+            .annotate(title=F("post__title"), author_username=F("author__username"))
+            .order_by(*ordering)
+            .values_list(*self.columns, named=True)[:limit]
+        )
+
+    def pulled(self, ordering, condition, limit):
+        skipped = Post.objects.filter(
+            author_id=OuterRef("following_id"), fanout_skipped=True
+        )
+        authors = list(
+            Follow.objects.filter(follower_id=self.profile_id)
+            .filter(Exists(skipped))
+            .values_list("following_id", flat=True)
+        )
+        if not authors:
+            return []
+
+        posts = Post.objects.annotate(post_id=F("id"))
+        latest = Q()
+        for author_id in authors:
+            latest |= Q(
+                pk__in=posts.filter(author_id=author_id, fanout_skipped=True)
+                .filter(condition)
+                .order_by(*ordering)
+                .values("pk")[:limit]
+            )
+        return (
+            posts.filter(latest)
+            .annotate(author_username=F("author__username"))
+            .values_list(*self.columns, named=True)
+        )
+
+    def rows(self, ordering, condition, limit):
+        """Returns the first ``limit`` rows in ``ordering`` that match ``condition``"""
+        rows = [
+            *self.entries(ordering, condition, limit),
+            *self.pulled(ordering, condition, limit),
+        ]
+        rows.sort(
+            key=lambda row: (row.created_at, row.post_id),
+            reverse=ordering[0].startswith("-"),
+        )
+        return rows[:limit]
+
+
+def get_timeline(profile_id):
+    """Returns the home timeline of a profile: posts by the profiles it follows"""
+    return Timeline(profile_id)
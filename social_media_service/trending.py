@@ -0,0 +1,93 @@
+"""Time-decayed trending scores of posts, updated one event at a time.
+
+The score of a post is the sum of the weights of its events (its creation,
+its likes and its comments), each decayed by ``exp(-age / tau)`` where tau
+follows from TRENDING_HALF_LIFE. As time passes every score decays by the
+same factor, which leaves their order unchanged, so the column holds the
+sum as of a fixed epoch instead, in log space to keep it finite:
+
+    trending_score = ln(sum(weight * exp((event_time - EPOCH) / tau)))
+
+An event adds its term ``ln(weight) + (event_time - EPOCH) / tau`` with a
+log-sum-exp, and undoing it (an unlike, a deleted comment) subtracts the
+term it added; a deleted thread takes back those of all its comments at
+once. The expressions are applied by the UPDATE that adjusts the
+engagement counters of the post, see counters.py. Scores are never
+recomputed in bulk, and the top posts at any moment are the first rows of
+post_trending_idx. New weights and half-lives apply to the events that
+follow.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+# Keeps a score finite when a removal cancels out everything it holds
+_FLOOR = 1e-12
+
+
+def event_score(event, when=None):
+    """Returns the log-space term an event of the given kind adds to a score"""
+    tau = settings.TRENDING_HALF_LIFE / math.log(2)
+    age = ((when or timezone.now()) - EPOCH).total_seconds()
+    return math.log(settings.TRENDING_WEIGHTS[event]) + age / tau
+
+
+def initial_score():
+    """Score of a post without engagement, whose creation counts as an event"""
+    return event_score("post")
+
+
+def added(event, when=None):
+    """Returns the new score of a row once an event is added to it"""
+    # ln(e^s + e^x) = max(s, x) + ln(1 + e^-|s - x|)
+    score = F("trending_score")
+    term = Value(event_score(event, when), output_field=FloatField())
+    return Greatest(score, term) + Ln(Value(1.0) + Exp(Value(0.0) - Abs(score - term)))
+
+
+def _without(term):
+    # ln(e^s - e^x) = s + ln(1 - e^(x - s))
+    score = F("trending_score")
+    term = Value(term, output_field=FloatField())
+    return score + Ln(Greatest(Value(1.0) - Exp(term - score), Value(_FLOOR)))
+
+
+def removed(event, when):
+    """Returns the new score of a row once an event made at ``when`` is taken back"""
+    return _without(event_score(event, when))
+
+
+def _sum(terms):
+    # ln(e^x1 + e^x2 + ...), shifted by the largest term to stay finite
+    top = max(terms)
+    return top + math.log(sum(math.exp(term - top) for term in terms))
+
+
+def removed_all(event, times):
+    """Like ``removed()`` for several events of the same row, made at ``times``"""
+    return _without(_sum([event_score(event, when) for when in times]))
+
+
+def removed_each(event, times):
+    """Like ``removed()`` for several rows, given the time of each as ``{pk: when}``"""
+    return Case(
+        *(When(pk=pk, then=removed(event, when)) for pk, when in times.items()),
+        default=F("trending_score"),
+    )
+
+
+def removed_events(events):
+    """Like ``removed()`` for any events of several rows, given as ``{pk: [(event, when)]}``"""
+    return Case(
+        *(
+            When(pk=pk, then=_without(_sum([event_score(*item) for item in items])))
+            for pk, items in events.items()
+        ),
+        default=F("trending_score"),
+    )
@@ -0,0 +1,97 @@
+"""Chunked, resumable uploads written straight to their file under MEDIA_ROOT.
+
+A client creates an UploadSession with the file size, PUTs consecutive byte
+ranges with a Content-Range header and finalizes the session, which checks
+that the file is a complete image. Each chunk is copied from the request
+stream to the file UPLOAD_COPY_BUFFER_SIZE bytes at a time, so memory use
+does not depend on the size of the chunk or the file. After an interruption
+the client reads ``received`` from the session and resumes from there.
+Finalized uploads are attached to a Post or Profile by id: the file is moved
+to the name the image field would have given it.
+
+A chunk is streamed outside of any database transaction, holding an
+exclusive lock on the upload file instead, so a slow client only holds up
+the other chunks of its own upload. The new position is then stored with
+a conditional UPDATE on the one the chunk started from.
+"""
+import fcntl
+import os
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class UploadError(Exception):
+    pass
+
+
+def parse_content_range(header):
+    """Returns the (start, end, total) of a Content-Range header"""
+    match = CONTENT_RANGE.fullmatch(header or "")
+    if match is None:
+        raise UploadError("Content-Range must look like 'bytes <start>-<end>/<size>'.")
+    start, end, total = map(int, match.groups())
+    if end < start:
+        raise UploadError("Content-Range ends before it starts.")
+    return start, end, total
+
+
+@contextmanager
+def open_locked(upload):
+    """Opens the upload file for writing, holding an exclusive lock on it.
+
+    Chunks of the same upload sent at the same time wait for each other, so
+    the second one sees the position stored by the first.
+    """
+    path = default_storage.path(upload.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(os.open(path, os.O_RDWR | os.O_CREAT, 0o666), "r+b") as target:
+        fcntl.flock(target, fcntl.LOCK_EX)
+        yield target
+
+
+def write_chunk(target, stream, start, length):
+    """Copies ``length`` bytes of the stream into the upload file at ``start``.
+
+    Returns the number of bytes written, less than ``length`` if the stream
+    ended early; anything past ``start`` left by an earlier attempt is
+    overwritten.
+    """
+    written = 0
+    target.seek(start)
+    while written < length:
+        chunk = stream.read(min(settings.UPLOAD_COPY_BUFFER_SIZE, length - written))
+        if not chunk:
+            break
+        target.write(chunk)
+        written += len(chunk)
+    target.truncate()
+    return written
+
+
+def verify_image(upload):
+    """Raises UploadError unless the upload file is a complete, readable image"""
+    try:
+        with Image.open(default_storage.path(upload.path)) as image:
+            image.verify()
+    except Exception:
+        raise UploadError("The uploaded file is not a valid image.")
+
+
+def claim(upload, instance, field_name):
+    """Moves a finalized upload to the name the instance's image field would
+    give it, deletes the session and returns the new storage name"""
+    field = instance._meta.get_field(field_name)
+    name = default_storage.get_available_name(
+        field.generate_filename(instance, upload.filename)
+    )
+    target = default_storage.path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(default_storage.path(upload.path), target)
+    upload.delete()
+    return name
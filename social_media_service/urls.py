@@ -1,14 +1,48 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import ProfileViewSet, PostViewSet
+from . import async_views
+from .views import ProfileViewSet, PostViewSet, UploadViewSet
 
 app_name = "social_media_service"
 
 router = routers.DefaultRouter()
 router.register("profiles", ProfileViewSet)
 router.register("posts", PostViewSet)
+router.register("uploads", UploadViewSet)
+
+# Coroutine versions of the hot read routes, for ASGI deployments
+async_urlpatterns = [
+    path("posts/", async_views.PostListView.as_view(), name="post-list"),
+    path("posts/<int:pk>/", async_views.PostDetailView.as_view(), name="post-detail"),
+    path(
+        "posts/<int:pk>/comments/",
+        async_views.PostCommentsView.as_view(),
+        name="post-comments",
+    ),
+    path(
+        "profiles/<int:pk>/followers/",
+        async_views.FollowersView.as_view(),
+        name="profile-followers",
+    ),
+    path(
+        "profiles/<int:pk>/following/",
+        async_views.FollowingView.as_view(),
+        name="profile-following",
+    ),
+    path(
+        "profiles/<int:pk>/following_posts/",
+        async_views.FollowingPostsView.as_view(),
+        name="profile-following-posts",
+    ),
+    path(
+        "profiles/<int:pk>/liked_posts/",
+        async_views.LikedPostsView.as_view(),
+        name="profile-liked-posts",
+    ),
+]
 
 urlpatterns = [
+    path("async/", include((async_urlpatterns, "async"))),
     path("", include(router.urls)),
 ]
@@ -1,40 +1,102 @@
+import io
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets, status
+from rest_framework import mixins, serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Profile, Follow, Post, Like, Comment
+from social_media_api.instrumentation import TimedAuthenticationMixin
+from social_media_api.throttling import ScopedRateThrottle
+from . import (
+    conditional,
+    counters,
+    graph_index,
+    object_cache,
+    search,
+    threads,
+    timeline,
+    trending,
+    uploads,
+)
+from .fast_serializers import (
+    FastFollowerListSerializer,
+    FastFollowingListSerializer,
+    FastLikeListSerializer,
+    FastPostListSerializer,
+)
+from .models import Profile, Follow, Post, Like, Comment, UploadSession
+from .pagination import KeysetPagination, IdKeysetPagination, TimelinePagination
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
     ProfileSerializer,
-    FollowingListSerializer,
-    FollowerListSerializer,
     PostSerializer,
-    LikeListSerializer,
-    PostListSerializer,
     CommentSerializer,
+    CommentThreadSerializer,
+    BulkIdsSerializer,
+    BulkResultSerializer,
+    FollowStatusSerializer,
+    FollowSuggestionSerializer,
+    ProfileSampleSerializer,
+    UploadSessionSerializer,
+)
+from .signals import follows_created, follows_deleted
+
+PROFILE_PARAMETER = OpenApiParameter(
+    "profile",
+    type=OpenApiTypes.INT,
+    required=True,
+    description="Id of the other profile (ex. ?profile=2)",
+)
+LIMIT_PARAMETER = OpenApiParameter(
+    "limit",
+    type=OpenApiTypes.INT,
+    description="Number of profiles listed, up to 100 (ex. ?limit=5)",
 )
 
 
-class ProfileViewSet(viewsets.ModelViewSet):
+def _query_int(request, name, **kwargs):
+    """Returns a validated integer query parameter, raising 400 for a bad one"""
+    try:
+        return serializers.IntegerField(**kwargs).run_validation(
+            request.query_params.get(name, empty)
+        )
+    except ValidationError as error:
+        raise ValidationError({name: error.detail})
+
+
+class ProfileViewSet(
+    TimedAuthenticationMixin,
+    object_cache.CachedObjectMixin,
+    conditional.ConditionalRetrieveMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Profile.objects.select_related("user")
+    etag_kind = "profile"
     serializer_class = ProfileSerializer
+    pagination_class = IdKeysetPagination
     permission_classes = (
         IsAuthenticated,
         IsOwnerOrReadOnly,
     )
+    # Write actions set their scope, see social_media_api/throttling.py
+    throttle_scope = None
 
     def get_queryset(self):
-        """Returns a list of all user profiles that match the specified username parameter, if provided"""
+        """Returns a list of all user profiles, ranked by relevance to the username parameter if provided"""
         queryset = self.queryset
         username = self.request.query_params.get("username")
 
         if username:
-            queryset = queryset.filter(username__icontains=username)
+            queryset = search.search(queryset, username)
 
-        return queryset.distinct()
+        return queryset
 
     def perform_create(self, serializer):
         """Creates a new user profile and associates it with the authenticated user"""
@@ -42,12 +104,59 @@ class ProfileViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         """Updates an existing user profile for the authenticated user"""
-        serializer.save(user=self.request.user)
+        username = serializer.instance.username
+        profile = serializer.save(user=self.request.user)
+        if profile.username != username:
+            # The comment lists show the username under the ETag of their post
+            conditional.touch_many(
+                Post,
+                Comment.objects.filter(profile=profile)
+                .values_list("post_id", flat=True)
+                .distinct(),
+            )
 
     def perform_destroy(self, instance):
         """Deletes the specified user profile if the authenticated user is the owner"""
+        followed = list(
+            Follow.objects.filter(follower=instance).values_list(
+                "following_id", flat=True
+            )
+        )
+        followers = list(
+            Follow.objects.filter(following=instance).values_list(
+                "follower_id", flat=True
+            )
+        )
+        # The likes and comments that go with the profile, except on its own posts
+        events, parents = {}, set()
+        likes = Like.objects.filter(profile=instance).exclude(post__author=instance)
+        for post_id, created_at in likes.values_list("post_id", "created_at"):
+            events.setdefault(post_id, []).append(("like", created_at))
+        comments = Comment.objects.filter(
+            Q(profile=instance) | Q(parent__profile=instance)
+        ).exclude(post__author=instance)
+        for post_id, parent_id, created_at in comments.values_list(
+            "post_id", "parent_id", "created_at"
+        ):
+            events.setdefault(post_id, []).append(("comment", created_at))
+            if parent_id:
+                parents.add(parent_id)
+
         instance.delete()
 
+        counters.adjust_many(Profile, followed, followers_count=-1)
+        counters.adjust_many(Profile, followers, following_count=-1)
+        if events:
+            counters.reconcile_posts(
+                Post.objects.filter(pk__in=events),
+                {"trending_score": trending.removed_events(events)},
+            )
+            object_cache.invalidate(Post, *events)
+        if parents:
+            # Threads started by the profile are gone and match no row
+            counters.reconcile_comments(Comment.objects.filter(pk__in=parents))
+            object_cache.invalidate(Comment, *parents)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -61,7 +170,12 @@ class ProfileViewSet(viewsets.ModelViewSet):
         """Returns a list of all user profiles that match the 'username' parameter if it is specified"""
         return super().list(request, *args, **kwargs)
 
-    @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated])
+    @action(
+        detail=True,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="follow",
+    )
     def follow(self, request, pk=None):
         """Creates a request to subscribe to the user profile with the specified pk"""
         follower = self.request.user.profile
@@ -70,13 +184,17 @@ class ProfileViewSet(viewsets.ModelViewSet):
         if follower == following:
             return Response({"detail": "You cannot follow yourself."})
 
-        follow, created = Follow.objects.get_or_create(
-            follower=follower, following=following
-        )
+        created = Follow.objects.insert_ignore(follower=follower, following=following)
 
         if not created:
             return Response({"detail": "You are already following this user."})
 
+        counters.adjust(Profile, follower.pk, following_count=1)
+        counters.adjust(Profile, following.pk, followers_count=1)
+        follows_created.send(
+            sender=Follow, follower_id=follower.pk, following_ids=[following.pk]
+        )
+
         return Response({"detail": f"You are now following {following.full_name}."})
 
     @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated])
@@ -85,79 +203,234 @@ class ProfileViewSet(viewsets.ModelViewSet):
         follower = self.request.user.profile
         following = self.get_object()
 
-        follow = Follow.objects.filter(follower=follower, following=following).first()
-
         if follower == following:
             return Response({"detail": "You cannot unfollow yourself."})
 
-        if not follow:
+        deleted, _ = Follow.objects.filter(
+            follower=follower, following=following
+        ).delete()
+
+        if not deleted:
             return Response({"detail": "You are not following this user."})
 
-        follow.delete()
+        counters.adjust(Profile, follower.pk, following_count=-1)
+        counters.adjust(Profile, following.pk, followers_count=-1)
+        follows_deleted.send(
+            sender=Follow, follower_id=follower.pk, following_ids=[following.pk]
+        )
 
         return Response({"detail": f"You have unfollowed {following.full_name}."})
 
-    @action(detail=True, methods=["GET"])
+    @extend_schema(request=BulkIdsSerializer, responses=BulkResultSerializer(many=True))
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=None,
+        throttle_scope="follow",
+    )
+    def bulk_follow(self, request):
+        """Subscribes to every user profile in 'ids' with a single insert and reports the outcome per id"""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        follower = self.request.user.profile
+
+        found = set(Profile.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        candidates = [pk for pk in ids if pk in found and pk != follower.pk]
+        # Counted from the rows written, which concurrent follows may have taken
+        created = set(
+            Follow.objects.insert_ignore_many(
+                [Follow(follower=follower, following_id=pk) for pk in candidates],
+                returning="following_id",
+            )
+        )
+        results = []
+        for pk in ids:
+            if pk not in found:
+                results.append({"id": pk, "status": "not_found"})
+            elif pk == follower.pk:
+                results.append({"id": pk, "status": "self"})
+            elif pk in created:
+                results.append({"id": pk, "status": "followed"})
+            else:
+                results.append({"id": pk, "status": "already_following"})
+
+        if created:
+            counters.adjust(Profile, follower.pk, following_count=len(created))
+            counters.adjust_many(Profile, created, followers_count=1)
+            follows_created.send(
+                sender=Follow, follower_id=follower.pk, following_ids=sorted(created)
+            )
+
+        return Response(BulkResultSerializer(results, many=True).data)
+
+    @extend_schema(request=BulkIdsSerializer, responses=BulkResultSerializer(many=True))
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=None,
+    )
+    def bulk_unfollow(self, request):
+        """Cancels the subscriptions to every user profile in 'ids' with a single delete"""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        follower = self.request.user.profile
+
+        removed = {
+            pk
+            for (pk,) in Follow.objects.delete_returning(
+                "following_id", follower=follower, following_id__in=ids
+            )
+        }
+        results = [
+            {"id": pk, "status": "unfollowed" if pk in removed else "not_following"}
+            for pk in ids
+        ]
+
+        if removed:
+            counters.adjust(Profile, follower.pk, following_count=-len(removed))
+            counters.adjust_many(Profile, removed, followers_count=-1)
+            follows_deleted.send(
+                sender=Follow, follower_id=follower.pk, following_ids=list(removed)
+            )
+
+        return Response(BulkResultSerializer(results, many=True).data)
+
+    @action(detail=True, methods=["GET"], pagination_class=KeysetPagination)
     def followers(self, request, pk=None):
         """Returns a list of all users who have subscribed to the user profile with the specified pk"""
         profile = self.get_object()
-        serializer = FollowerListSerializer(profile.followers.all(), many=True)
-        return Response(serializer.data)
+        follows = self.paginate_queryset(
+            FastFollowerListSerializer.rows_for(profile.followers.all())
+        )
+        serializer = FastFollowerListSerializer(follows)
+        return self.get_paginated_response(serializer.data)
 
-    @action(detail=True, methods=["GET"])
+    @action(detail=True, methods=["GET"], pagination_class=KeysetPagination)
     def following(self, request, pk=None):
         """Returns a list of all user profiles that the user with the specified pk is subscribed to"""
         profile = self.get_object()
-        serializer = FollowingListSerializer(profile.following.all(), many=True)
-        return Response(serializer.data)
+        follows = self.paginate_queryset(
+            FastFollowingListSerializer.rows_for(profile.following.all())
+        )
+        serializer = FastFollowingListSerializer(follows)
+        return self.get_paginated_response(serializer.data)
 
-    @action(detail=True, methods=["GET"])
+    @action(detail=True, methods=["GET"], pagination_class=KeysetPagination)
     def posts(self, request, pk=None):
         """Returns a list of all posts created by the user with the specified pk"""
         profile = self.get_object()
-        posts = Post.objects.filter(author=profile)
+        posts = self.paginate_queryset(Post.objects.filter(author=profile))
         serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
-    @action(detail=True, methods=["GET"])
+    @action(detail=True, methods=["GET"], pagination_class=TimelinePagination)
     def following_posts(self, request, pk=None):
         """Returns a list of all posts created by users that the user with the specified pk is subscribed to"""
         profile = self.get_object()
-        followings = profile.followers.all()
-        posts = Post.objects.filter(author__following__in=followings)
-        serializer = PostListSerializer(posts, many=True)
-        return Response(serializer.data)
+        posts = self.paginate_queryset(timeline.get_timeline(profile.pk))
+        serializer = FastPostListSerializer(posts)
+        return self.get_paginated_response(serializer.data)
+
+    def profile_sample(self, request, ids):
+        """Returns how many profiles there are, with the first 'limit' of them"""
+        limit = _query_int(request, "limit", min_value=1, max_value=100, default=20)
+        rows = (
+            Profile.objects.filter(pk__in=ids[:limit])
+            .order_by("pk")
+            .values("id", "username")
+        )
+        return ProfileSampleSerializer({"count": len(ids), "results": rows}).data
+
+    @extend_schema(parameters=[PROFILE_PARAMETER], responses=FollowStatusSerializer)
+    @action(detail=True, methods=["GET"], pagination_class=None)
+    def is_following(self, request, pk=None):
+        """Tells whether the user with the specified pk follows the 'profile', and the other way round"""
+        profile = self.get_object()
+        other = _query_int(request, "profile", min_value=1)
+        status_data = {
+            "following": graph_index.follows(profile.pk, other),
+            "followed_by": graph_index.follows(other, profile.pk),
+        }
+        return Response(FollowStatusSerializer(status_data).data)
+
+    @extend_schema(
+        parameters=[PROFILE_PARAMETER, LIMIT_PARAMETER],
+        responses=ProfileSampleSerializer,
+    )
+    @action(detail=True, methods=["GET"], pagination_class=None)
+    def mutuals(self, request, pk=None):
+        """Returns the profiles that follow both the user with the specified pk and the 'profile'"""
+        profile = self.get_object()
+        other = _query_int(request, "profile", min_value=1)
+        ids = graph_index.mutual_followers(profile.pk, other)
+        return Response(self.profile_sample(request, ids))
+
+    @extend_schema(parameters=[LIMIT_PARAMETER], responses=ProfileSampleSerializer)
+    @action(detail=True, methods=["GET"], pagination_class=None)
+    def followed_by_friends(self, request, pk=None):
+        """Returns the profiles the current user is subscribed to that follow the user with the specified pk"""
+        profile = self.get_object()
+        ids = graph_index.followed_by_friends(request.user.profile.pk, profile.pk)
+        return Response(self.profile_sample(request, ids))
 
-    @action(detail=True, methods=["GET"])
+    @action(detail=True, methods=["GET"], pagination_class=KeysetPagination)
+    def suggestions(self, request, pk=None):
+        """Returns the profiles followed by the most profiles that the user with the specified pk is subscribed to"""
+        profile = self.get_object()
+        suggestions = self.paginate_queryset(
+            profile.suggestions.select_related("suggested").order_by(
+                "-score", "suggested_id"
+            )
+        )
+        serializer = FollowSuggestionSerializer(suggestions, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["GET"], pagination_class=KeysetPagination)
     def liked_posts(self, request, pk=None):
         """Returns a list of all posts that were liked by the user with the specified pk"""
         profile = self.get_object()
-        likes = profile.likes.all()
-        serializer = LikeListSerializer(likes, many=True)
-        return Response(serializer.data)
+        likes = self.paginate_queryset(
+            FastLikeListSerializer.rows_for(profile.likes.all())
+        )
+        serializer = FastLikeListSerializer(likes)
+        return self.get_paginated_response(serializer.data)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(
+    TimedAuthenticationMixin,
+    object_cache.CachedObjectMixin,
+    conditional.ConditionalRetrieveMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Post.objects.select_related("author")
+    etag_kind = "post"
     serializer_class = PostSerializer
+    pagination_class = KeysetPagination
     permission_classes = (
         IsAuthenticated,
         IsOwnerOrReadOnly,
     )
+    # Write actions set their scope, see social_media_api/throttling.py
+    throttle_scope = None
 
     def get_queryset(self):
-        """Returns a queryset of Post objects, filtered by title if provided"""
+        """Returns a queryset of Post objects, ranked by relevance to the title if provided"""
         queryset = self.queryset
         title = self.request.query_params.get("title")
 
         if title:
-            queryset = queryset.filter(title__icontains=title)
+            queryset = search.search(queryset, title)
 
-        return queryset.distinct()
+        return queryset
 
     def perform_create(self, serializer):
         """Saves the post author as the current user's profile on create"""
-        serializer.save(author=self.request.user.profile)
+        post = serializer.save(author=self.request.user.profile)
+        counters.adjust(Profile, post.author_id, posts_count=1)
 
     def perform_update(self, serializer):
         """Update a specific post, if the requesting user is the author"""
@@ -166,6 +439,7 @@ class PostViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance):
         instance.delete()
+        counters.adjust(Profile, instance.author_id, posts_count=-1)
 
     @extend_schema(
         parameters=[
@@ -180,17 +454,33 @@ class PostViewSet(viewsets.ModelViewSet):
         """Returns a list of posts that match the 'name' parameter if it is specified"""
         return super().list(request, *args, **kwargs)
 
-    @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated])
+    @action(detail=False, methods=["GET"])
+    def trending(self, request):
+        """Returns the posts with the most time-decayed engagement first"""
+        posts = self.paginate_queryset(self.queryset.order_by("-trending_score", "-id"))
+        serializer = self.get_serializer(posts, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="like",
+    )
     def like(self, request, pk=None):
         """Allows users to like a post"""
         profile = self.request.user.profile
         post = self.get_object()
 
-        like, created = Like.objects.get_or_create(profile=profile, post=post)
+        created = Like.objects.insert_ignore(profile=profile, post=post)
 
         if not created:
             return Response({"detail": "You have already liked this post."})
 
+        counters.adjust(
+            Post, post.pk, {"trending_score": trending.added("like")}, likes_count=1
+        )
+
         return Response({"detail": f"You are liked {post.title} now."})
 
     @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated])
@@ -199,30 +489,167 @@ class PostViewSet(viewsets.ModelViewSet):
         profile = self.request.user.profile
         post = self.get_object()
 
-        like = Like.objects.filter(profile=profile, post=post).first()
+        # The trending score takes back the term the like added when it was made
+        deleted = Like.objects.delete_returning(
+            "created_at", profile=profile, post=post
+        )
 
-        if not like:
+        if not deleted:
             return Response({"detail": "You have not liked this post."})
+        ((liked_at,),) = deleted
 
-        like.delete()
+        counters.adjust(
+            Post,
+            post.pk,
+            {"trending_score": trending.removed("like", liked_at)},
+            likes_count=-1,
+        )
 
         return Response({"detail": f"You have unliked {post.title}."})
 
-    @action(detail=True, methods=["GET"], permission_classes=[IsAuthenticated])
+    @extend_schema(request=BulkIdsSerializer, responses=BulkResultSerializer(many=True))
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=None,
+        throttle_scope="like",
+    )
+    def bulk_like(self, request):
+        """Likes every post in 'ids' with a single insert and reports the outcome per id"""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        profile = self.request.user.profile
+
+        found = set(Post.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        candidates = [pk for pk in ids if pk in found]
+        # Counted from the rows written, which concurrent likes may have taken
+        created = set(
+            Like.objects.insert_ignore_many(
+                [Like(profile=profile, post_id=pk) for pk in candidates],
+                returning="post_id",
+            )
+        )
+        results = []
+        for pk in ids:
+            if pk not in found:
+                results.append({"id": pk, "status": "not_found"})
+            elif pk in created:
+                results.append({"id": pk, "status": "liked"})
+            else:
+                results.append({"id": pk, "status": "already_liked"})
+
+        if created:
+            counters.adjust_many(
+                Post, created, {"trending_score": trending.added("like")}, likes_count=1
+            )
+
+        return Response(BulkResultSerializer(results, many=True).data)
+
+    @extend_schema(request=BulkIdsSerializer, responses=BulkResultSerializer(many=True))
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=None,
+    )
+    def bulk_unlike(self, request):
+        """Removes the likes from every post in 'ids' with a single delete"""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        profile = self.request.user.profile
+
+        removed = dict(
+            Like.objects.delete_returning(
+                "post_id", "created_at", profile=profile, post_id__in=ids
+            )
+        )
+        results = [
+            {"id": pk, "status": "unliked" if pk in removed else "not_liked"}
+            for pk in ids
+        ]
+
+        if removed:
+            counters.adjust_many(
+                Post,
+                removed,
+                {"trending_score": trending.removed_each("like", removed)},
+                likes_count=-1,
+            )
+
+        return Response(BulkResultSerializer(results, many=True).data)
+
+    @action(
+        detail=True,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated],
+        serializer_class=CommentThreadSerializer,
+    )
     def comments(self, request, pk=None):
-        """Returns all comments for a post"""
+        """Returns top-level comments with their first replies, or 304 if the ETag is current"""
         post = self.get_object()
-        comments = post.comments.all()
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        etag = conditional.make_etag("comments", post.pk, post.version)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
 
-    @action(detail=True, methods=["POST"], permission_classes=[IsAuthenticated])
+        comments = self.paginate_queryset(
+            post.comments.filter(parent__isnull=True).select_related("profile")
+        )
+        threads.attach_replies(post, comments)
+        serializer = CommentThreadSerializer(comments, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response["ETag"] = etag
+        return response
+
+    @action(
+        detail=True,
+        methods=["GET"],
+        url_path="replies/(?P<comment_pk>[^/.]+)",
+        permission_classes=[IsAuthenticated],
+        serializer_class=CommentSerializer,
+    )
+    def replies(self, request, pk=None, comment_pk=None):
+        """Returns the replies to a comment of a post, oldest first"""
+        post = self.get_object()
+        comment = get_object_or_404(post.comments, pk=comment_pk)
+        etag = conditional.make_etag("replies", comment.pk, post.version)
+        response = conditional.not_modified(request, etag)
+        if response is not None:
+            return response
+
+        replies = self.paginate_queryset(
+            post.comments.filter(parent=comment)
+            .select_related("profile")
+            .order_by("created_at", "id")
+        )
+        serializer = CommentSerializer(replies, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response["ETag"] = etag
+        return response
+
+    @action(
+        detail=True,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        throttle_scope="comment",
+    )
     def add_comment(self, request, pk=None):
-        """Adds a comment to a post"""
+        """Adds a comment to a post, or a reply to the comment given as 'parent'"""
         post = self.get_object()
-        serializer = CommentSerializer(data=request.data)
+        serializer = CommentSerializer(data=request.data, context={"post": post})
         if serializer.is_valid():
-            serializer.save(profile=request.user.profile, post=post)
+            comment = serializer.save(profile=request.user.profile, post=post)
+            counters.adjust(
+                Post,
+                post.pk,
+                {"trending_score": trending.added("comment", comment.created_at)},
+                comments_count=1,
+            )
+            if comment.parent_id:
+                counters.adjust(Comment, comment.parent_id, replies_count=1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -235,14 +662,17 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     def update_comment(self, request, pk=None, comment_pk=None):
         """Updates a comment on a post"""
-        comment = Comment.objects.get(pk=comment_pk)
+        comment = get_object_or_404(
+            Comment.objects.select_related("profile", "post"), pk=comment_pk, post=pk
+        )
         serializer = CommentSerializer(comment, data=request.data, partial=True)
 
-        if comment.profile != self.request.user.profile:
+        if comment.profile_id != self.request.user.profile.pk:
             return Response(status=status.HTTP_403_FORBIDDEN)
 
         if serializer.is_valid():
             serializer.save()
+            conditional.touch(Post, comment.post_id)
             return Response(serializer.data)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -254,12 +684,131 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer_class=CommentSerializer,
     )
     def delete_comment(self, request, pk=None, comment_pk=None):
-        """Deletes a comment from a post"""
-        comment = Comment.objects.get(pk=comment_pk)
+        """Deletes a comment from a post, along with its replies"""
+        comment = get_object_or_404(Comment, pk=comment_pk, post=pk)
 
-        if comment.profile != self.request.user.profile:
+        if comment.profile_id != self.request.user.profile.pk:
             return Response(status=status.HTTP_403_FORBIDDEN)
 
+        created = [comment.created_at]
+        if comment.parent_id is None:
+            created += comment.replies.values_list("created_at", flat=True)
         comment.delete()
+        counters.adjust(
+            Post,
+            comment.post_id,
+            {"trending_score": trending.removed_all("comment", created)},
+            comments_count=-len(created),
+        )
+        if comment.parent_id:
+            counters.adjust(Comment, comment.parent_id, replies_count=-1)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadViewSet(
+    TimedAuthenticationMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = (IsAuthenticated,)
+    # Every chunk is a request, so uploads get their own budget
+    throttle_classes = (ScopedRateThrottle,)
+    throttle_scope = "uploads"
+
+    def get_queryset(self):
+        """Returns the upload sessions of the authenticated user"""
+        return self.queryset.filter(profile_id=self.request.user.profile.pk)
+
+    def perform_create(self, serializer):
+        serializer.save(profile=self.request.user.profile)
+
+    def perform_destroy(self, instance):
+        default_storage.delete(instance.path)
+        instance.delete()
+
+    @extend_schema(
+        request={"application/octet-stream": OpenApiTypes.BINARY},
+        parameters=[
+            OpenApiParameter(
+                "Content-Range",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.HEADER,
+                required=True,
+                description="Byte range of the body (ex. bytes 0-1048575/5242880)",
+            ),
+        ],
+    )
+    def update(self, request, pk=None):
+        """Writes the byte range given in the Content-Range header, which must start where the upload left off"""
+        try:
+            start, end, total = uploads.parse_content_range(
+                request.META.get("HTTP_CONTENT_RANGE")
+            )
+        except uploads.UploadError as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = self.get_object()
+        if total != upload.size or end >= upload.size:
+            return Response(
+                {"detail": "The range does not fit the size of the upload."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with uploads.open_locked(upload) as target:
+            # Read again now that no other chunk of this upload is running
+            upload.refresh_from_db(fields=["received", "completed"])
+            if upload.completed:
+                return Response(
+                    {"detail": "This upload is already finalized."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if start != upload.received:
+                return Response(
+                    {"detail": f"Resume the upload at byte {upload.received}."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            length = end - start + 1
+            # Without a body DRF has no stream, which writes nothing
+            stream = request.stream or io.BytesIO()
+            written = uploads.write_chunk(target, stream, start, length)
+            stored = UploadSession.objects.filter(
+                pk=upload.pk, received=start, completed=False
+            ).update(received=start + written)
+            if not stored:
+                return Response(
+                    {"detail": "The upload changed while the chunk was written."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            upload.received = start + written
+
+        if upload.received != end + 1:
+            return Response(
+                {"detail": f"Incomplete chunk, resume at byte {upload.received}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=["POST"])
+    def finalize(self, request, pk=None):
+        """Completes an upload once every byte has been received and the file is a valid image"""
+        upload = self.get_object()
+
+        if upload.received != upload.size:
+            return Response(
+                {"detail": f"Only {upload.received} of {upload.size} bytes received."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            uploads.verify_image(upload)
+        except uploads.UploadError as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload.completed = True
+        upload.save(update_fields=["completed"])
+        return Response(self.get_serializer(upload).data)
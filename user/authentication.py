@@ -0,0 +1,124 @@
+"""JWT authentication that resolves users from the cache.
+
+The user is cached for AUTH_USER_CACHE_TIMEOUT seconds, so an authenticated
+request costs no SQL for ``request.user``. ``request.user.profile`` is a
+handle built from the token's ``profile_id`` claim, once the user is read
+along with a check that the profile still belongs to them; tokens issued
+without the claim, or whose profile was replaced since, get the profile
+looked up instead.
+
+Entries are keyed on the user id, a generation token drawn per user and
+the token's ``auth_version`` and ``profile_id`` claims, the first being a
+fingerprint of the password hash when it was issued. Saving or deleting a
+user or a profile drops the generation (see user/signals.py), which
+orphans every entry of the user. After a password change that skipped
+the signals, new tokens miss the entries of the old ones, which are
+rejected once their own entry expires and the user is read again.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from social_media_service.models import Profile
+
+
+AUTH_VERSION_CLAIM = "auth_version"
+
+
+def auth_version(user):
+    """Returns the fingerprint of the user's password that tokens carry"""
+    return user.get_session_auth_hash()[:16]
+
+
+def _generation_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def user_cache_key(user_id, version, profile_id):
+    """Returns the key of the user's entry for tokens with the given claims"""
+    generation = cache.get_or_set(
+        _generation_key(user_id),
+        lambda: uuid.uuid4().hex,
+        timeout=settings.AUTH_USER_CACHE_TIMEOUT,
+        version=settings.AUTH_USER_CACHE_VERSION,
+    )
+    return f"auth:user:{user_id}:{generation}:{version}:{profile_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(_generation_key(user_id), version=settings.AUTH_USER_CACHE_VERSION)
+
+
+def profile_handle(user, profile_id):
+    """Returns the user's profile with only its keys loaded.
+
+    That is enough for FK assignment and comparisons; any other field is
+    read from the database on first access.
+    """
+    return Profile.from_db(
+        router.db_for_read(Profile), ["id", "user_id"], [profile_id, user.pk]
+    )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        profile_id = validated_token.get("profile_id")
+        version = validated_token.get(AUTH_VERSION_CLAIM)
+        key = user_cache_key(user_id, version, profile_id)
+        user = cache.get(key, version=settings.AUTH_USER_CACHE_VERSION)
+        if user is None:
+            users = self.user_model.objects.all()
+            if profile_id is None:
+                users = users.select_related("profile")
+            else:
+                users = users.annotate(
+                    profile_claimed=Exists(
+                        Profile.objects.filter(pk=profile_id, user_id=OuterRef("pk"))
+                    )
+                )
+            try:
+                user = users.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if version is not None and version != auth_version(user):
+                raise AuthenticationFailed(
+                    _("Token was issued before the password changed"),
+                    code="token_not_valid",
+                )
+            if profile_id is not None and user.profile_claimed:
+                user.profile = profile_handle(user, profile_id)
+            elif profile_id is not None:
+                # The profile was replaced since the token was issued
+                profile = Profile.objects.filter(user_id=user.pk).first()
+                if profile is not None:
+                    user.profile = profile
+            cache.set(
+                key,
+                user,
+                timeout=settings.AUTH_USER_CACHE_TIMEOUT,
+                version=settings.AUTH_USER_CACHE_VERSION,
+            )
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documents CachedJWTAuthentication like the JWTAuthentication it extends"""
+
+    target_class = CachedJWTAuthentication
@@ -0,0 +1,130 @@
+"""Bloom filter index over the blacklisted refresh tokens.
+
+Every process keeps a Bloom filter of the jti of the rows in
+``BlacklistedToken``. A token that is not in the filter is certainly not
+blacklisted, so refreshing and verifying a valid token costs no SQL however
+large the tables grow; a hit is confirmed with one indexed lookup.
+
+The filter is synced incrementally by primary key. Blacklisting a token
+bumps a generation counter in the cache, which makes every process sync on
+its next check; without a shared cache backend other processes pick new
+rows up within TOKEN_BLACKLIST_SYNC_INTERVAL seconds. Each sync re-reads
+the last TOKEN_BLACKLIST_SYNC_OVERLAP ids to catch rows whose transaction
+committed out of id order.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+GENERATION_KEY = "token-blacklist:generation"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Kirsch-Mitzenmacher double hashing over one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        if all(
+            self.bits[position >> 3] & (1 << (position & 7)) for position in positions
+        ):
+            return
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, capacity=0):
+        """Empties the filter so that the next check reloads it from scratch.
+
+        The new filter holds ``capacity`` tokens, and never fewer than
+        TOKEN_BLACKLIST_BLOOM_CAPACITY.
+        """
+        self.bloom = BloomFilter(
+            max(capacity, settings.TOKEN_BLACKLIST_BLOOM_CAPACITY),
+            settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE,
+        )
+        self.last_id = 0
+        self.generation = None
+        self.synced_at = -math.inf
+
+    def sync(self):
+        """Adds the rows blacklisted since the last sync, if there may be any"""
+        generation = cache.get(GENERATION_KEY)
+        now = time.monotonic()
+        if (
+            generation == self.generation
+            and now - self.synced_at < settings.TOKEN_BLACKLIST_SYNC_INTERVAL
+        ):
+            return
+
+        with self.lock:
+            # Rows are never removed from a Bloom filter: once it is past its
+            # capacity, rebuild it from the surviving rows with room for as
+            # many again, so that full scans get rarer as the table grows
+            if self.bloom.count > self.bloom.capacity:
+                self.reset(2 * BlacklistedToken.objects.count())
+
+            start = max(self.last_id - settings.TOKEN_BLACKLIST_SYNC_OVERLAP, 0)
+            rows = (
+                BlacklistedToken.objects.filter(pk__gt=start)
+                .order_by("pk")
+                .values_list("pk", "token__jti")
+            )
+            for pk, jti in rows.iterator():
+                self.bloom.add(jti)
+                self.last_id = max(self.last_id, pk)
+            self.generation = generation
+            self.synced_at = now
+
+    def is_blacklisted(self, jti):
+        self.sync()
+        if jti not in self.bloom:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+index = BlacklistIndex()
+
+
+def is_blacklisted(jti):
+    """Returns True if the token with the given jti has been blacklisted"""
+    return index.is_blacklisted(jti)
+
+
+def notify():
+    """Tells every process that tokens have been blacklisted"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        if not cache.add(GENERATION_KEY, 1, timeout=None):
+            cache.incr(GENERATION_KEY)
@@ -1,8 +1,17 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 
+from social_media_api.instrumentation import TimedSerializerMixin
+from social_media_service.models import Profile
+from user.authentication import AUTH_VERSION_CLAIM, auth_version
+from user.blacklist import is_blacklisted
+from user.tokens import RefreshToken
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ("id", "email", "password", "is_staff")
@@ -22,3 +31,37 @@ class UserSerializer(serializers.ModelSerializer):
             user.save()
 
         return user
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        """Adds the user's profile id and auth version, which access tokens refreshed from it inherit"""
+        token = super().get_token(user)
+        token[AUTH_VERSION_CLAIM] = auth_version(user)
+        token["profile_id"] = (
+            Profile.objects.filter(user=user).values_list("pk", flat=True).first()
+        )
+        return token
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(
+            token.get(api_settings.JTI_CLAIM)
+        ):
+            raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
+
+
+class TokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    token_class = RefreshToken
@@ -1,7 +1,25 @@
-from django.test import TestCase
+import math
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from rest_framework import status
-from rest_framework.test import APIRequestFactory, force_authenticate
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import exceptions, status
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social_media_service.models import Profile
+from user import blacklist
+from user.authentication import CachedJWTAuthentication
+from user.serializers import TokenObtainPairSerializer
+from user.tokens import RefreshToken
 from user.views import CreateUserView, ManageUserView
 
 
@@ -110,3 +128,203 @@ class ManageUserViewTest(TestCase):
 
 
 
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="cached@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(user=self.user, username="cached")
+        self.client = APIClient()
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.url = reverse("user:manage")
+
+    def test_user_and_profile_are_resolved_without_sql(self):
+        self.client.get(self.url)
+        request = APIRequestFactory().get(self.url)
+        request.META["HTTP_AUTHORIZATION"] = self.client._credentials[
+            "HTTP_AUTHORIZATION"
+        ]
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+            self.assertEqual(user.profile.pk, self.profile.pk)
+
+    def test_update_invalidates_cached_user(self):
+        self.client.get(self.url)
+        self.client.patch(self.url, {"email": "changed@example.com"})
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["email"], "changed@example.com")
+
+    def test_update_does_not_write_back_the_cached_user(self):
+        self.client.get(self.url)
+        # Written by another process, whose invalidation never reaches this cache
+        get_user_model().objects.filter(pk=self.user.pk).update(is_staff=True)
+
+        response = self.client.patch(self.url, {"email": "changed@example.com"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "changed@example.com")
+        self.assertTrue(self.user.is_staff)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ProfileClaimTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="claim@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(user=self.user, username="claim")
+
+    def test_token_carries_profile_id(self):
+        response = APIClient().post(
+            reverse("user:token_obtain_pair"),
+            {"email": "claim@example.com", "password": "testpassword"},
+        )
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["profile_id"], self.profile.pk)
+
+        response = APIClient().post(
+            reverse("user:token_refresh"), {"refresh": response.data["refresh"]}
+        )
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["profile_id"], self.profile.pk)
+
+    def test_profile_handle_is_resolved_without_sql(self):
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with self.assertNumQueries(1):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+            self.assertEqual(user.profile, self.profile)
+            self.assertEqual(user.profile.user_id, self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.profile.username, "claim")
+
+    def test_replaced_profile_is_looked_up(self):
+        stale = TokenObtainPairSerializer.get_token(self.user).access_token
+        self.profile.delete()
+        profile = Profile.objects.create(user=self.user, username="recreated")
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+
+        for access in (stale, token, stale):
+            request = APIRequestFactory().get(
+                "/", HTTP_AUTHORIZATION=f"Bearer {access}"
+            )
+            user, _ = CachedJWTAuthentication().authenticate(request)
+            self.assertEqual(user.profile, profile)
+            self.assertEqual(user.profile.username, "recreated")
+
+
+class AuthVersionClaimTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="version@example.com", password="testpassword"
+        )
+        self.url = reverse("user:manage")
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get(
+            self.url, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        return CachedJWTAuthentication().authenticate(request)
+
+    def test_password_change_rejects_older_tokens(self):
+        old_token = TokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(old_token)
+
+        self.user.set_password("newpassword")
+        # Skips the signals that would drop the cached user
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=self.user.password, is_active=False
+        )
+
+        token = TokenObtainPairSerializer.get_token(self.user).access_token
+        with self.assertRaisesMessage(
+            exceptions.AuthenticationFailed, "User is inactive"
+        ):
+            self.authenticate(token)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=True)
+        cache.clear()
+        with self.assertRaisesMessage(
+            exceptions.AuthenticationFailed, "password changed"
+        ):
+            self.authenticate(old_token)
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+
+
+class TokenBlacklistTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist.index.reset()
+        self.user = get_user_model().objects.create_user(
+            email="logout@example.com", password="testpassword"
+        )
+        self.refresh = str(TokenObtainPairSerializer.get_token(self.user))
+        self.client = APIClient()
+
+    def refresh_token(self):
+        return self.client.post(
+            reverse("user:token_refresh"), {"refresh": self.refresh}
+        )
+
+    def test_valid_token_is_refreshed_without_sql(self):
+        self.refresh_token()
+        with self.assertNumQueries(0):
+            response = self.refresh_token()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_blacklisted_token_is_rejected(self):
+        self.refresh_token()
+        response = self.client.post(
+            reverse("user:token_blacklist"), {"refresh": self.refresh}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.refresh_token()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_expired_tokens(self):
+        token = RefreshToken(self.refresh)
+        token.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now())
+        fresh = TokenObtainPairSerializer.get_token(self.user)
+
+        call_command("purge_expired_tokens", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)),
+            [fresh["jti"]],
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    @override_settings(TOKEN_BLACKLIST_BLOOM_CAPACITY=2)
+    def test_full_filter_is_rebuilt_with_room_for_the_rows(self):
+        blacklist.index.reset()
+        for _ in range(3):
+            TokenObtainPairSerializer.get_token(self.user).blacklist()
+        blacklist.index.sync()
+        blacklist.index.synced_at = -math.inf
+        blacklist.index.sync()
+        self.assertEqual(blacklist.index.bloom.capacity, 6)
+        self.assertEqual(blacklist.index.bloom.count, 3)
+
+        RefreshToken(self.refresh).blacklist()
+        blacklist.index.synced_at = -math.inf
+        with self.assertNumQueries(1):
+            blacklist.index.sync()
+        self.assertEqual(blacklist.index.bloom.capacity, 6)
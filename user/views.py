@@ -1,18 +1,39 @@
+from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from social_media_api.instrumentation import TimedAuthenticationMixin
+from social_media_service import conditional
+from social_media_service.models import Profile
+from user.authentication import CachedJWTAuthentication
 from user.serializers import UserSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(TimedAuthenticationMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(TimedAuthenticationMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
+        """Returns the authenticated user, loaded fresh for updates.
+
+        ``request.user`` comes from the cache, and saving writes every
+        column, so updating it would put back is_staff, is_active or any
+        other column changed since it was cached, in this process or in
+        another one whose invalidations never reach it.
+        """
+        if self.request.method in ("PUT", "PATCH"):
+            return get_user_model().objects.get(pk=self.request.user.pk)
         return self.request.user
+
+    def perform_update(self, serializer):
+        """Saves the user and invalidates the ETag of its profile, which shows the email"""
+        serializer.save()
+        # Joined in by CachedJWTAuthentication
+        profile = getattr(self.request.user, "profile", None)
+        if profile is not None:
+            conditional.touch(Profile, profile.pk)